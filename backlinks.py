@@ -0,0 +1,24 @@
+from anki.lang import _
+from aqt import mw
+from aqt.utils import tooltip
+
+from .browser import open_browser
+from .link_index import backlinks
+
+
+def show_backlinks(nid: int) -> None:
+    """Show in the browser the notes linking to note nid."""
+    if not nid:
+        tooltip(_("This note is not saved yet."))
+        return
+
+    def on_done(future) -> None:
+        mw.progress.finish()
+        nids = future.result()
+        if not nids:
+            tooltip(_("No note links to this one."))
+            return
+        open_browser("nid:" + ",".join(str(nid) for nid in nids))
+
+    mw.progress.start(label=_("Indexing links..."), immediate=False)
+    mw.taskman.run_in_background(lambda: backlinks(nid), on_done)
@@ -0,0 +1,181 @@
+"""Adds to a note a list of links to the notes or cards selected in the
+browser, e.g. to build an index note.
+
+The display text of all links is read with one query, and the target
+note is saved once, after a checkpoint, so that the whole insertion is
+undone at once.
+"""
+import html
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from anki.lang import _
+from anki.utils import ids2str, stripHTMLMedia
+from aqt import gui_hooks, mw
+from aqt.qt import (QAction, QComboBox, QDialog, QDialogButtonBox, QFormLayout,
+                    QLineEdit, QListWidget, QListWidgetItem, Qt)
+from aqt.utils import showWarning, tooltip
+
+from . import note_index
+from .config import getUserOption, setUserOption
+from .links import link_html
+
+# Choice of the display field meaning the note's sort field.
+SORT_FIELD = _("(Sort field)")
+
+
+def field_names(mids: Sequence[int]) -> List[str]:
+    """The names of the fields of the note types mids, in order,
+    without duplicates."""
+    names: Dict[str, None] = {}
+    for mid in mids:
+        model = mw.col.models.get(mid)
+        if model:
+            names.update(dict.fromkeys(field["name"] for field in model["flds"]))
+    return list(names)
+
+
+def link_targets(cids: Sequence[int], to_cards: bool, display_field: str) -> List[Tuple[str, str]]:
+    """The (query, display text) of the links to cids, or to their notes
+    if not to_cards, in the order of cids, read with one query."""
+    rows = mw.col.db.all(
+        f"""select c.id, n.id, n.mid, n.flds, n.sfld from cards c
+        join notes n on c.nid = n.id where c.id in {ids2str(cids)}""")
+    row_of_cid = {row[0]: row for row in rows}
+    field_index: Dict[int, Optional[int]] = {}
+    targets = {}
+    for cid in cids:
+        if cid not in row_of_cid:
+            continue
+        nid, mid, flds, sfld = row_of_cid[cid][1:]
+        query = f"cid:{cid}" if to_cards else f"nid:{nid}"
+        if query in targets:
+            continue
+        if mid not in field_index:
+            names = [field["name"] for field in mw.col.models.get(mid)["flds"]]
+            field_index[mid] = names.index(display_field) if display_field in names else None
+        index = field_index[mid]
+        text = str(sfld) if index is None else flds.split("\x1f")[index]
+        targets[query] = html.escape(stripHTMLMedia(text).strip()) or query
+    return list(targets.items())
+
+
+def insert_links(nid: int, field: int, open_in: str, targets: Sequence[Tuple[str, str]]) -> None:
+    """Append to field `field` of note nid a list of links to targets."""
+    note = mw.col.getNote(nid)
+    items = "".join(
+        f"<li>{link_html(open_in, query, text)}</li>" for query, text in targets)
+    mw.checkpoint(_("Insert links"))
+    note.fields[field] += f"<ul>{items}</ul>"
+    note.flush()
+    mw.reset()
+
+
+def link_selection(browser) -> None:
+    cids = browser.selectedCards()
+    if not cids:
+        tooltip(_("Select the notes or cards to link to."))
+        return
+    mids = mw.col.db.list(
+        f"select distinct n.mid from cards c join notes n on c.nid = n.id where c.id in {ids2str(cids)}")
+
+    dialog = QDialog(browser, Qt.Dialog)
+    dialog.setWindowTitle(_("Link selected notes"))
+    layout = QFormLayout(dialog)
+
+    line_target = QLineEdit(dialog)
+    line_target.setPlaceholderText(_("Note id"))
+    layout.addRow(_("Target note"), line_target)
+    line_find = QLineEdit(dialog)
+    line_find.setPlaceholderText(_("Part of the sort field"))
+    list_found = QListWidget(dialog)
+    list_found.setMaximumHeight(120)
+    layout.addRow(_("Find note"), line_find)
+    layout.addRow("", list_found)
+
+    combo_field = QComboBox(dialog)
+    layout.addRow(_("Add to field"), combo_field)
+    combo_display = QComboBox(dialog)
+    display_fields = [SORT_FIELD] + field_names(mids)
+    for name in display_fields:
+        combo_display.addItem(name)
+    layout.addRow(_("Display field"), combo_display)
+    combo_to = QComboBox(dialog)
+    combo_to.addItem(_("Notes"))
+    combo_to.addItem(_("Cards"))
+    layout.addRow(_("Link to"), combo_to)
+    combo_open_in = QComboBox(dialog)
+    combo_open_in.addItem(_("Browser"))
+    combo_open_in.addItem(_("Previewer"))
+    combo_open_in.setCurrentIndex(
+        {"Browser search": 0, "Previewer": 1}.get(getUserOption("Last open in", "Browser search"), 0))
+    layout.addRow(_("Open in"), combo_open_in)
+    bbox = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+    bbox.accepted.connect(dialog.accept)
+    bbox.rejected.connect(dialog.reject)
+    layout.addRow(bbox)
+
+    def target_nid() -> Optional[int]:
+        text = line_target.text().strip()
+        return int(text) if text.isdigit() else None
+
+    def on_target_changed(*args) -> None:
+        combo_field.clear()
+        nid = target_nid()
+        mid = None if nid is None else mw.col.db.scalar(
+            "select mid from notes where id = ?", nid)
+        for name in field_names([mid] if mid else []):
+            combo_field.addItem(name)
+
+    def on_find_changed(text) -> None:
+        list_found.clear()
+        for nid, sort_field in note_index.find_notes(text):
+            item = QListWidgetItem(sort_field)
+            item.setData(Qt.UserRole, nid)
+            list_found.addItem(item)
+
+    def on_index_built() -> None:
+        # What was typed before the index was built.
+        on_find_changed(line_find.text())
+
+    note_index.build_in_background(on_index_built)
+
+    line_target.textChanged.connect(on_target_changed)
+    line_find.textChanged.connect(on_find_changed)
+    list_found.itemClicked.connect(
+        lambda item: line_target.setText(str(item.data(Qt.UserRole))))
+    current = browser.editor.note
+    if current is not None and current.id:
+        line_target.setText(str(current.id))
+
+    accepted = dialog.exec()
+    note_index.stop_waiting(on_index_built)
+    mw.setupDialogGC(dialog)
+    if not accepted:
+        return
+    nid = target_nid()
+    if nid is None or combo_field.currentIndex() < 0:
+        showWarning(_("Choose an existing target note."))
+        return
+    open_in = ["Browser search", "Previewer"][combo_open_in.currentIndex()]
+    setUserOption("Last open in", open_in)
+    to_cards = combo_to.currentIndex() == 1
+    display_field = display_fields[combo_display.currentIndex()]
+    field = combo_field.currentIndex()
+
+    def insert() -> None:
+        targets = link_targets(cids, to_cards, display_field)
+        insert_links(nid, field, open_in, targets)
+        tooltip(_("%d links inserted.") % len(targets))
+
+    # The editor may show the target note, or one of the linked notes,
+    # with changes not saved yet.
+    browser.editor.saveNow(insert)
+
+
+def _on_browser_menus(browser) -> None:
+    action = QAction(_("Link selected notes..."), browser)
+    action.triggered.connect(lambda: link_selection(browser))
+    browser.form.menu_Notes.addAction(action)
+
+
+gui_hooks.browser_menus_did_init.append(_on_browser_menus)
@@ -0,0 +1,714 @@
+"""A stand-in for the parts of anki, aqt and PyQt5 used by the add-on.
+
+It allows to load the add-on and run its hot paths without Anki nor a
+display. The collection is a SQLite database with the same notes and
+cards tables as Anki's, filled with synthetic notes; every query on it
+is counted. Timers and background tasks are run by a simple event
+loop, on a virtual clock, with `loop.run()`.
+
+Only the behaviour the add-on relies on is imitated; results are
+comparable between two versions of the add-on, not with Anki.
+"""
+import heapq
+import importlib.util
+import itertools
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import types
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ADDON_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADDON_PACKAGE = "link_addon"
+
+
+# Event loop
+
+class Timer:
+    def __init__(self, func: Callable[[], None], repeat: bool):
+        self.func = func
+        self.repeat = repeat
+        self.stopped = False
+
+    def stop(self) -> None:
+        self.stopped = True
+
+
+class EventLoop:
+    """Runs timers and the end of background tasks in order of their
+    time, on a virtual clock in milliseconds.
+
+    run() only runs what is due within `horizon` milliseconds, which is
+    enough for an operation of the user to finish. Longer timers, such
+    as the idle timer of the previewer pool, are left pending, and the
+    clock only advances to the last thing run, so they never run.
+    Repeating timers are never run either."""
+
+    def __init__(self):
+        self.now = 0
+        # (time, sequence, func, timer), the sequence keeping the order
+        # of what is due at the same time.
+        self.pending: List[Tuple[int, int, Callable[[], None], Optional[Timer]]] = []
+        self._sequence = itertools.count()
+
+    def call_later(self, delay: int, func: Callable[[], None], timer: Optional[Timer] = None) -> None:
+        heapq.heappush(self.pending, (self.now + delay, next(self._sequence), func, timer))
+
+    def call_soon(self, func: Callable[[], None]) -> None:
+        self.call_later(0, func)
+
+    def timer(self, delay: int, func: Callable[[], None], repeat: bool, *args, **kwargs) -> Timer:
+        timer = Timer(func, repeat)
+        if not repeat:
+            self.call_later(delay, func, timer)
+        return timer
+
+    def run(self, horizon: int = 5000) -> None:
+        end = self.now + horizon
+        while self.pending and self.pending[0][0] <= end:
+            self.now, _, func, timer = heapq.heappop(self.pending)
+            if timer is None or not timer.stopped:
+                func()
+        # Timers restarted by every operation would pile up otherwise.
+        self.pending = [entry for entry in self.pending
+                        if entry[3] is None or not entry[3].stopped]
+        heapq.heapify(self.pending)
+
+
+loop = EventLoop()
+
+
+# Hooks
+
+class Hook:
+    """A hook whose handlers are called in turn. For a filter hook, the
+    value returned by a handler is given to the next one."""
+
+    def __init__(self, filter: bool = False):
+        self.filter = filter
+        self._handlers: List[Callable] = []
+
+    def append(self, handler: Callable) -> None:
+        self._handlers.append(handler)
+
+    def remove(self, handler: Callable) -> None:
+        self._handlers.remove(handler)
+
+    def __call__(self, *args):
+        if self.filter:
+            value, rest = args[0], args[1:]
+            for handler in self._handlers:
+                value = handler(value, *rest)
+            return value
+        for handler in self._handlers:
+            handler(*args)
+        return None
+
+
+# Qt
+
+class Signal:
+    def __init__(self):
+        self._slots: List[Callable] = []
+
+    def connect(self, slot: Callable) -> None:
+        self._slots.append(slot)
+
+    def disconnect(self, slot: Optional[Callable] = None) -> None:
+        if slot is None:
+            self._slots = []
+        else:
+            self._slots.remove(slot)
+
+    def emit(self, *args) -> None:
+        for slot in list(self._slots):
+            slot(*args)
+
+
+class Anything:
+    """Any value: an enumeration, a method, a signal, or what they return."""
+
+    def __call__(self, *args, **kwargs) -> "Anything":
+        return self
+
+    def __getattr__(self, name: str) -> "Anything":
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return self
+
+    def __or__(self, other: Any) -> "Anything":
+        return self
+
+    __ror__ = __or__
+
+
+anything = Anything()
+
+
+class _QtMeta(type):
+    # Enumerations, such as Qt.Window, and static methods.
+    def __getattr__(cls, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return anything
+
+
+class QWidget(metaclass=_QtMeta):
+    """Any widget: every method is accepted and does nothing."""
+
+    def __init__(self, *args, **kwargs):
+        self.clicked = Signal()
+        self.toggled = Signal()
+        self.finished = Signal()
+        self.textChanged = Signal()
+        self.currentIndexChanged = Signal()
+        self.itemClicked = Signal()
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return anything
+
+
+class QLineEdit(QWidget):
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._text = ""
+
+    def text(self) -> str:
+        return self._text
+
+    def setText(self, text: str) -> None:
+        if text != self._text:
+            self._text = text
+            self.textChanged.emit(text)
+
+    def lineEdit(self) -> "QLineEdit":
+        return self
+
+
+class QComboBox(QWidget):
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._items: List[str] = []
+        self._index = -1
+
+    def addItem(self, text: str) -> None:
+        self._items.append(text)
+        if self._index == -1:
+            # As Qt, select the first item.
+            self.setCurrentIndex(0)
+
+    def clear(self) -> None:
+        self._items = []
+        self.setCurrentIndex(-1)
+
+    def setItemText(self, index: int, text: str) -> None:
+        self._items[index] = text
+
+    def currentIndex(self) -> int:
+        return self._index
+
+    def setCurrentIndex(self, index: int) -> None:
+        if index != self._index:
+            self._index = index
+            self.currentIndexChanged.emit(index)
+
+
+class QCheckBox(QWidget):
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self._checked = False
+
+    def setChecked(self, checked: bool) -> None:
+        self._checked = checked
+
+    def isChecked(self) -> bool:
+        return self._checked
+
+
+class QDialogButtonBox(QWidget):
+    def addButton(self, *args, **kwargs) -> QWidget:
+        return QWidget()
+
+
+class QDialog(QWidget):
+    def exec(self) -> int:
+        return 1
+
+    exec_ = exec
+
+    def close(self) -> None:
+        self.finished.emit(0)
+
+
+class QListWidget(QWidget):
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.items: List[Any] = []
+
+    def clear(self) -> None:
+        self.items = []
+
+    def addItem(self, item: Any) -> None:
+        self.items.append(item)
+
+
+class QListWidgetItem(QWidget):
+    def __init__(self, text: str = ""):
+        super().__init__()
+        self._text = text
+        self._data: Dict[int, Any] = {}
+
+    def setData(self, role: int, value: Any) -> None:
+        self._data[role] = value
+
+    def data(self, role: int) -> Any:
+        return self._data.get(role)
+
+
+class QKeySequence(QWidget):
+    def toString(self, *args) -> str:
+        return ""
+
+
+class QCoreApplication:
+    @staticmethod
+    def translate(context: str, text: str) -> str:
+        return text
+
+
+_qt_classes = {cls.__name__: cls for cls in (
+    QWidget, QLineEdit, QComboBox, QCheckBox, QDialogButtonBox, QDialog,
+    QListWidget, QListWidgetItem, QKeySequence, QCoreApplication)}
+
+
+def _qt_module(name: str) -> types.ModuleType:
+    """A module whose unknown attributes are widget classes."""
+    module = types.ModuleType(name)
+
+    def getattr_(attribute: str) -> Any:
+        if attribute.startswith("__"):
+            raise AttributeError(attribute)
+        if attribute not in _qt_classes:
+            _qt_classes[attribute] = _QtMeta(attribute, (QWidget,), {})
+        return _qt_classes[attribute]
+
+    module.__getattr__ = getattr_
+    return module
+
+
+# Collection
+
+class CountingDB:
+    """The collection's database, counting the queries."""
+
+    def __init__(self, db: sqlite3.Connection):
+        self._db = db
+        self.calls = 0
+
+    def execute(self, sql: str, *args) -> List[tuple]:
+        self.calls += 1
+        return self._db.execute(sql, args).fetchall()
+
+    all = execute
+
+    def list(self, sql: str, *args) -> List[Any]:
+        return [row[0] for row in self.execute(sql, *args)]
+
+    def scalar(self, sql: str, *args) -> Any:
+        rows = self.execute(sql, *args)
+        return rows[0][0] if rows else None
+
+    def first(self, sql: str, *args) -> Optional[tuple]:
+        rows = self.execute(sql, *args)
+        return rows[0] if rows else None
+
+
+class Note:
+    def __init__(self, col: "Collection", id: int):
+        self.col = col
+        self.id = id
+        self.load()
+
+    def load(self) -> None:
+        self.guid, self.mod, flds = self.col.db.first(
+            "select guid, mod, flds from notes where id = ?", self.id)
+        self.fields = flds.split("\x1f")
+
+    def model(self) -> Dict[str, Any]:
+        return {"sortf": 0}
+
+    def flush(self) -> None:
+        hooks.note_will_flush(self)
+        self.mod += 1
+        self.col.db.execute(
+            "update notes set mod = ?, flds = ?, sfld = ? where id = ?",
+            self.mod, "\x1f".join(self.fields), self.fields[0], self.id)
+
+    def cards(self) -> List["Card"]:
+        return [self.col.getCard(cid) for cid in self.col.db.list(
+            "select id from cards where nid = ? order by ord", self.id)]
+
+
+class Card:
+    def __init__(self, col: "Collection", id: int):
+        self.col = col
+        self.id = id
+        self.nid, self.ord = col.db.first(
+            "select nid, ord from cards where id = ?", id)
+        self._note: Optional[Note] = None
+        self._render: Optional[tuple] = None
+
+    def note(self, reload: bool = False) -> Note:
+        if self._note is None or reload:
+            self._note = self.col.getNote(self.nid)
+        return self._note
+
+    def render_output(self, reload: bool = False) -> tuple:
+        if self._render is None or reload:
+            self.col.renders += 1
+            fields = self.note(reload).fields
+            question = "".join(
+                f"<div class=field>{field}</div>" for field in fields[:1])
+            answer = question + "<hr id=answer>" + "".join(
+                f"<div class=field>{field}</div>" for field in fields[1:])
+            self._render = (question, answer)
+        return self._render
+
+    def q(self, reload: bool = False) -> str:
+        return self.render_output(reload)[0]
+
+    def a(self) -> str:
+        return self.render_output()[1]
+
+    def question_av_tags(self) -> list:
+        return []
+
+    def answer_av_tags(self) -> list:
+        return []
+
+
+_search_re = re.compile(r"^(nid|cid|deck|tag):(.*)$")
+
+
+class Collection:
+    def __init__(self, db: sqlite3.Connection):
+        self.db = CountingDB(db)
+        self.mod = 1
+        self.renders = 0
+        self.sched = types.SimpleNamespace(today=100)
+        self._config: Dict[str, Any] = {}
+        model = {"id": 1, "sortf": 0, "flds": [{"name": "Front"}, {"name": "Back"}]}
+        self.models = types.SimpleNamespace(get=lambda mid: model if mid == 1 else None)
+
+    def find_cards(self, query: str) -> List[int]:
+        if " or " in query:
+            found = {}
+            for part in query.split(" or "):
+                found.update(dict.fromkeys(self.find_cards(part.strip("()"))))
+            return list(found)
+        match = _search_re.match(query)
+        if match is None:
+            return self.db.list(
+                "select c.id from cards c join notes n on c.nid = n.id where n.flds like ?",
+                f"%{query}%")
+        kind, value = match.groups()
+        if kind in ("nid", "cid"):
+            column = "nid" if kind == "nid" else "id"
+            return self.db.list(
+                f"select id from cards where {column} in ({value})")
+        if kind == "deck":
+            return self.db.list(
+                "select c.id from cards c join decks d on c.did = d.id where d.name = ?",
+                value)
+        return self.db.list(
+            "select c.id from cards c join notes n on c.nid = n.id where n.tags like ?",
+            f"% {value} %")
+
+    def getCard(self, id: int) -> Card:
+        return Card(self, id)
+
+    def getNote(self, id: int) -> Note:
+        return Note(self, id)
+
+    def get_config(self, key: str, default: Any = None) -> Any:
+        return self._config.get(key, default)
+
+    def set_config(self, key: str, value: Any) -> None:
+        self._config[key] = value
+
+    def setMod(self) -> None:
+        self.mod += 1
+
+
+def make_collection(notes: int, link_density: float, seed: int = 0,
+                    field_kb: int = 0) -> Collection:
+    """A collection of `notes` notes with two cards each.
+
+    A tenth of the notes are in deck "Small", the others in deck "Big".
+    A fraction link_density of the notes have a link to another note
+    in their back field, which is padded with field_kb KB."""
+    random.seed(seed)
+    db = sqlite3.connect(":memory:")
+    db.executescript("""
+create table notes (
+    id integer primary key, guid text not null, mid integer not null,
+    mod integer not null, usn integer not null, tags text not null,
+    flds text not null, sfld text not null, csum integer not null,
+    flags integer not null, data text not null);
+create table cards (
+    id integer primary key, nid integer not null, did integer not null,
+    ord integer not null, mod integer not null);
+create index ix_cards_nid on cards (nid);
+create table decks (id integer primary key, name text not null);
+insert into decks values (1, 'Big'), (2, 'Small');
+""")
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta",
+             "theta", "iota", "kappa", "lambda", "mu", "nu", "xi", "omicron"]
+    note_rows = []
+    card_rows = []
+    for index in range(notes):
+        nid = 1_000_000 + index
+        front = " ".join(random.choice(words) for _ in range(3)) + f" {index}"
+        back = " ".join(random.choice(words) for _ in range(40))
+        back += "x" * (field_kb * 1024)
+        if random.random() < link_density:
+            target = 1_000_000 + random.randrange(notes)
+            back += (f' <a data-link-open="Previewer" '
+                     f'data-link-query="nid:{target}">see also</a>')
+        did = 2 if index % 10 == 0 else 1
+        note_rows.append((nid, f"g{index}", 1, 1, 0, f" tag{index % 50} ",
+                          f"{front}\x1f{back}", front, 0, 0, ""))
+        for ord in (0, 1):
+            card_rows.append((2 * nid + ord, nid, did, ord, 1))
+    db.executemany("insert into notes values (?,?,?,?,?,?,?,?,?,?,?)", note_rows)
+    db.executemany("insert into cards values (?,?,?,?,?)", card_rows)
+    return Collection(db)
+
+
+# Main window
+
+class Progress:
+    def timer(self, delay: int, func: Callable[[], None], repeat: bool, *args, **kwargs) -> Timer:
+        return loop.timer(delay, func, repeat)
+
+    def start(self, *args, **kwargs) -> None:
+        pass
+
+    def update(self, *args, **kwargs) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+    def want_cancel(self) -> bool:
+        return False
+
+
+class TaskManager:
+    def run_in_background(self, task: Callable[[], Any], on_done: Optional[Callable[[Future], None]] = None) -> None:
+        future: Future = Future()
+        try:
+            future.set_result(task())
+        except Exception as error:
+            future.set_exception(error)
+        if on_done is not None:
+            loop.call_soon(lambda: on_done(future))
+
+    def run_on_main(self, func: Callable[[], None]) -> None:
+        loop.call_soon(func)
+
+
+class AddonManager:
+    def __init__(self):
+        with open(os.path.join(ADDON_PATH, "config.json"), encoding="utf-8") as file:
+            self._config = json.load(file)
+        self.writes = 0
+
+    def getConfig(self, module: str) -> Dict[str, Any]:
+        return self._config
+
+    def writeConfig(self, module: str, config: Dict[str, Any]) -> None:
+        self.writes += 1
+        self._config = config
+
+    def setConfigUpdatedAction(self, module: str, action: Callable) -> None:
+        pass
+
+    def setWebExports(self, module: str, pattern: str) -> None:
+        pass
+
+    def addonFromModule(self, module: str) -> str:
+        return module.split(".")[0]
+
+
+class Reviewer:
+    def revHtml(self) -> str:
+        return ""
+
+    def autoplay(self, card: Card) -> bool:
+        return False
+
+    def replayAudio(self, previewer: Any) -> None:
+        pass
+
+
+class MainWindow:
+    def __init__(self):
+        self.col: Optional[Collection] = None
+        self.progress = Progress()
+        self.taskman = TaskManager()
+        self.addonManager = AddonManager()
+        self.reviewer = Reviewer()
+        self.pm = types.SimpleNamespace(name="bench")
+        self.form = types.SimpleNamespace(menuTools=QWidget())
+
+    def prepare_card_text_for_display(self, text: str) -> str:
+        return text
+
+    def setupDialogGC(self, dialog: Any) -> None:
+        pass
+
+    def checkpoint(self, name: str) -> None:
+        pass
+
+    def reset(self) -> None:
+        gui_hooks.state_did_reset()
+
+
+mw = MainWindow()
+
+
+class AnkiWebView(QWidget):
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.page_loads = 0
+        self.evals: List[str] = []
+
+    def stdHtml(self, *args, **kwargs) -> None:
+        self.page_loads += 1
+
+    def eval(self, js: str) -> None:
+        self.evals.append(js)
+
+    def evalWithCallback(self, js: str, callback: Callable[[Any], None]) -> None:
+        self.evals.append(js)
+        loop.call_soon(lambda: callback(None))
+
+    def set_bridge_command(self, func: Callable, context: Any) -> None:
+        pass
+
+
+class Browser:
+    def __init__(self):
+        self.form = types.SimpleNamespace(
+            searchEdit=QLineEdit(), tableView=QWidget())
+        self.model = types.SimpleNamespace(
+            cards=[], index=lambda row, column: (row, column))
+        self._lastSearchTxt = ""
+        self.searches = 0
+
+    def onSearchActivated(self) -> None:
+        self.searches += 1
+        self._lastSearchTxt = self.form.searchEdit.text()
+        self.model.cards = mw.col.find_cards(self._lastSearchTxt)
+
+
+class Dialogs:
+    def __init__(self):
+        self.browser: Optional[Browser] = None
+
+    def open(self, name: str, *args) -> Browser:
+        if self.browser is None:
+            self.browser = Browser()
+        return self.browser
+
+
+class Editor:
+    def __init__(self, note: Note):
+        self.note = note
+        self.card = None
+        self.parentWindow = None
+        self.web = AnkiWebView()
+        self.web.selectedText = lambda: "link"
+
+
+dialogs = Dialogs()
+
+
+# Modules
+
+def _module(name: str, **attributes: Any) -> types.ModuleType:
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+
+def _ids2str(ids) -> str:
+    return "(%s)" % ",".join(str(id) for id in ids)
+
+
+hooks = _module(
+    "anki.hooks",
+    note_will_flush=Hook(), card_will_flush=Hook(),
+    notes_will_be_deleted=Hook(), addHook=lambda name, func: None)
+gui_hooks = types.SimpleNamespace(
+    webview_did_receive_js_message=Hook(filter=True),
+    webview_will_set_content=Hook(),
+    card_will_show=Hook(filter=True),
+    profile_did_open=Hook(), profile_will_close=Hook(),
+    sync_did_finish=Hook(), state_did_reset=Hook(),
+    undo_state_did_change=Hook(), reviewer_will_show_context_menu=Hook(),
+    browser_menus_did_init=Hook())
+
+
+def install() -> None:
+    """Make anki, aqt and PyQt5 importable."""
+    anki = _module("anki", hooks=hooks)
+    _module("anki.cards", Card=Card)
+    _module("anki.lang", _=lambda text: text)
+    _module("anki.utils", ids2str=_ids2str,
+            stripHTMLMedia=lambda text: re.sub("<[^>]*>", "", text))
+    anki.hooks = hooks
+    _module("aqt", mw=mw, gui_hooks=gui_hooks, dialogs=dialogs,
+            AnkiQt=MainWindow)
+    sys.modules["aqt.qt"] = _qt_module("aqt.qt")
+    _module("aqt.editor", Editor=Editor)
+    _module("aqt.webview", AnkiWebView=AnkiWebView)
+    _module("aqt.sound",
+            av_player=types.SimpleNamespace(
+                play_tags=lambda tags: None,
+                clear_queue_and_maybe_interrupt=lambda: None),
+            play_clicked_audio=lambda cmd, card: None)
+    _module("aqt.theme", theme_manager=types.SimpleNamespace(
+        body_classes_for_card_ord=lambda ord: f"card card{ord + 1}"))
+    nothing = lambda *args, **kwargs: None  # noqa: E731
+    _module("aqt.utils", restoreGeom=nothing, saveGeom=nothing,
+            tooltip=nothing, showInfo=nothing, showWarning=nothing,
+            askUser=lambda *args, **kwargs: True, getFile=nothing,
+            getSaveFile=nothing)
+    pyqt = _module("PyQt5")
+    for name in ("QtCore", "QtGui", "QtWidgets"):
+        module = _qt_module(f"PyQt5.{name}")
+        sys.modules[module.__name__] = module
+        setattr(pyqt, name, module)
+
+
+def load_addon(col: Collection) -> types.ModuleType:
+    """Install the stand-ins, open col as the collection and import the
+    add-on as package ADDON_PACKAGE."""
+    install()
+    mw.col = col
+    spec = importlib.util.spec_from_file_location(
+        ADDON_PACKAGE, os.path.join(ADDON_PATH, "__init__.py"),
+        submodule_search_locations=[ADDON_PATH])
+    addon = importlib.util.module_from_spec(spec)
+    sys.modules[ADDON_PACKAGE] = addon
+    spec.loader.exec_module(addon)
+    return addon
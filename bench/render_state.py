@@ -0,0 +1,81 @@
+"""Benchmark of the change detection done by each previewer render.
+
+Previewer._renderScheduledPreview compares (side, cid, note mod) with
+the last rendered one. It used to obtain the note mod by loading the
+note twice per render; it now calls Previewer._previewStateAndMod once,
+which reads it with changes.note_mod, cached until the collection
+changes.
+
+The add-on is loaded with the stand-ins of bench/fake_anki.py, and the
+shipped _previewStateAndMod of a PreviewerListCards is timed against
+the former one, for a session alternating side flips and moves to the
+next card.
+
+    python bench/render_state.py [--notes N] [--field-kb K] [--renders R]
+"""
+import argparse
+import random
+import time
+from array import array
+
+import fake_anki
+
+
+def session(previewer, renders: int):
+    """Show each card on both sides, as the user would."""
+    random.seed(0)
+    for render in range(renders):
+        if render % 2 == 0:
+            previewer.index = random.randrange(len(previewer.cards))
+            previewer._previewState = "question"
+        else:
+            previewer._previewState = "answer"
+        yield
+
+
+def measure(state_and_mod, previewer, renders: int) -> float:
+    start = time.perf_counter()
+    for _ in session(previewer, renders):
+        state_and_mod()
+    return renders / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--field-kb", type=int, default=64)
+    parser.add_argument("--renders", type=int, default=20000)
+    args = parser.parse_args()
+    col = fake_anki.make_collection(args.notes, 0, field_kb=args.field_kb)
+    fake_anki.load_addon(col)
+    from link_addon.previewer_lib import PreviewerListCards
+
+    class FormerPreviewer(PreviewerListCards):
+        def _previewStateAndMod(self):
+            # As before: the note is reloaded, and this ran twice per
+            # render.
+            c = self.card()
+            n = c.note()
+            n.load()
+            return (self._previewState, c.id, n.mod)
+
+    cids = array("q", col.db.list("select id from cards order by id"))
+    former = FormerPreviewer(cids, None, fake_anki.mw)
+    current = PreviewerListCards(cids, None, fake_anki.mw)
+
+    def former_render():
+        former._previewStateAndMod()
+        former._previewStateAndMod()
+
+    before = measure(former_render, former, args.renders)
+    calls = col.db.calls
+    after = measure(current._previewStateAndMod, current, args.renders)
+    queries = (col.db.calls - calls) / args.renders
+    print(f"{args.notes} notes of {args.field_kb} KB, {args.renders} renders")
+    print(f"loading the note twice:      {before:12.0f} renders/s")
+    print(f"_previewStateAndMod:         {after:12.0f} renders/s ({queries:.2f} queries per render)")
+    print(f"speedup:                     {after / before:12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
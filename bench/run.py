@@ -0,0 +1,194 @@
+"""Benchmark of the add-on's hot paths on synthetic collections.
+
+Anki is not required: the add-on is loaded with the stand-ins of
+bench/fake_anki.py. Each collection size is measured in its own
+process, so that the caches of one run do not serve the next.
+
+Scenarios:
+  open note link     "Previewer:nid:N" for random notes
+  open query link    "Previewer:tag:T", a list previewer of 4% of the cards
+  next/prev          going through the cards of a list previewer
+  browser link       "Browser search:nid:N"
+  insert note link   the link dialog, with search type "Note"
+  insert card link   the link dialog, with search type "Card"
+
+The time spent importing the add-on is reported too. For each
+scenario: latency percentiles of the operations after the first one,
+the latency of the first one (empty caches), the mean number of
+queries on the collection per operation, and the peak memory allocated
+during the scenario, measured in a separate, shorter pass.
+
+    python bench/run.py [--sizes 1000,10000,100000] [--density 0.1] [--ops 200]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+import fake_anki
+
+SCENARIOS = ["open note link", "open query link", "next/prev",
+             "browser link", "insert note link", "insert card link"]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class Bench:
+    def __init__(self, notes: int, density: float):
+        self.notes = notes
+        self.col = fake_anki.make_collection(notes, density)
+        self.addon = fake_anki.load_addon(self.col)
+        from link_addon import previewer_lib, router
+        self.router = router
+        self.opened: List = []
+        open_preview = previewer_lib.Previewer._openPreview
+
+        def remember(previewer):
+            # To close it, as the user would.
+            self.opened.append(previewer)
+            open_preview(previewer)
+
+        previewer_lib.Previewer._openPreview = remember
+        self.random = random.Random(1)
+
+    def message(self, cmd: str) -> None:
+        self.router.on_js_message((False, None), cmd, None)
+        fake_anki.loop.run()
+
+    def close_previewers(self) -> None:
+        for previewer in self.opened:
+            previewer._previewWindow.close()
+        self.opened = []
+        fake_anki.loop.run()
+
+    def random_nid(self) -> int:
+        return 1_000_000 + self.random.randrange(self.notes)
+
+    def operation(self, scenario: str) -> Callable[[], None]:
+        """A function doing one operation of scenario. What is not
+        measured, such as closing the previewer, is done before it."""
+        if scenario == "open note link":
+            def open_note_link():
+                self.close_previewers()
+                return lambda: self.message(f"Previewer:nid:{self.random_nid()}")
+            return open_note_link
+        if scenario == "open query link":
+            def open_query_link():
+                self.close_previewers()
+                tag = self.random.randrange(50)
+                return lambda: self.message(f"Previewer:tag:tag{tag}")
+            return open_query_link
+        if scenario == "next/prev":
+            self.close_previewers()
+            self.message("Previewer:deck:Small")
+            previewer = self.opened[0]
+            steps = iter(range(10 ** 9))
+
+            def navigate():
+                # Forward through 20 cards, question then answer of
+                # each, then back to the first, which only shows their
+                # questions.
+                step = next(steps) % 60
+                move = previewer._onPreviewNext if step < 40 else previewer._onPreviewPrev
+
+                def go():
+                    move()
+                    fake_anki.loop.run()
+                return go
+            return navigate
+        if scenario == "browser link":
+            self.close_previewers()
+            return lambda: lambda: self.message(f"Browser search:nid:{self.random_nid()}")
+        if scenario in ("insert note link", "insert card link"):
+            from link_addon import editor
+            from link_addon.config import setUserOption
+            setUserOption("Last search type", scenario.split()[1].capitalize())
+
+            def insert_link():
+                note = self.col.getNote(self.random_nid())
+                return lambda: (editor.create_link(fake_anki.Editor(note)),
+                                fake_anki.loop.run())
+            return insert_link
+        raise ValueError(scenario)
+
+    def measure(self, scenario: str, ops: int) -> Dict[str, float]:
+        prepare = self.operation(scenario)
+        seconds = []
+        calls = 0
+        for _ in range(ops + 1):
+            operation = prepare()
+            start_calls = self.col.db.calls
+            start = time.perf_counter()
+            operation()
+            seconds.append(time.perf_counter() - start)
+            calls += self.col.db.calls - start_calls
+        milliseconds = [second * 1000 for second in seconds[1:]]
+        tracemalloc.start()
+        for _ in range(min(ops, 50)):
+            prepare()()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return {
+            "first": seconds[0] * 1000,
+            "p50": percentile(milliseconds, 0.5),
+            "p95": percentile(milliseconds, 0.95),
+            "p99": percentile(milliseconds, 0.99),
+            "queries": calls / (ops + 1),
+            "peak_kb": peak / 1024,
+        }
+
+
+def run_one(notes: int, density: float, ops: int) -> Dict[str, Any]:
+    bench = Bench(notes, density)
+    return {
+        "load_ms": bench.addon.load_seconds * 1000,
+        "scenarios": {scenario: bench.measure(scenario, ops) for scenario in SCENARIOS},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="numbers of notes, e.g. 1000,10000,100000,500000")
+    parser.add_argument("--density", type=float, default=0.1,
+                        help="fraction of the notes containing a link")
+    parser.add_argument("--ops", type=int, default=200,
+                        help="operations measured per scenario")
+    parser.add_argument("--json", action="store_true",
+                        help="print the results as JSON")
+    parser.add_argument("--one", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.one:
+        json.dump(run_one(args.one, args.density, args.ops), sys.stdout)
+        return
+    results = {}
+    for notes in (int(size) for size in args.sizes.split(",")):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--one", str(notes),
+             "--density", str(args.density), "--ops", str(args.ops)],
+            check=True, stdout=subprocess.PIPE).stdout
+        results[notes] = json.loads(output)
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        return
+    print(f"link density {args.density}, {args.ops} operations per scenario; times in ms")
+    print(f"{'notes':>7} {'scenario':<17} {'first':>8} {'p50':>7} {'p95':>7} "
+          f"{'p99':>7} {'queries':>8} {'peak KB':>8}")
+    for notes, measured in results.items():
+        print(f"{notes:>7} {'add-on load':<17} {measured['load_ms']:8.2f}")
+        for scenario, result in measured["scenarios"].items():
+            print(f"{notes:>7} {scenario:<17} {result['first']:8.2f} "
+                  f"{result['p50']:7.2f} {result['p95']:7.2f} {result['p99']:7.2f} "
+                  f"{result['queries']:8.1f} {result['peak_kb']:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,60 @@
-from aqt import dialogs, gui_hooks, mw
+import time
+from typing import Sequence
 
+from aqt import dialogs, mw
+from aqt.qt import QItemSelectionModel
 
-def on_bridge_browser(handled, cmd, context):
-    prefix = "Browser search:"
-    if not cmd.startswith(prefix):
-        return handled
-    search = cmd[len(prefix):]
+from . import router, timings
+from .guids import to_nid_search
+from .search import direct_cids, normalize
+
+
+def on_bridge_browser(search, context):
+    # The browser does its own search, which must occur on the main
+    # thread. Do it once the message is handled, so that the webview
+    # which sent it is not kept waiting.
+    clicked = time.perf_counter()
+
+    def open_target():
+        open_browser(search)
+        timings.record("click to browser", time.perf_counter() - clicked, search)
+
+    mw.progress.timer(0, open_target, False)
+
+
+def open_browser(search):
+    search = normalize(to_nid_search(search))
     browser = dialogs.open("Browser", mw)
+    # Rebuilding the table takes seconds on big collections. Avoid it
+    # when the browser already shows what the link targets.
+    targets = direct_cids(search)
+    if normalize(getattr(browser, "_lastSearchTxt", "")) == search:
+        if targets:
+            select_cards(browser, targets)
+        return
+    if targets and select_cards(browser, targets):
+        return
     browser.form.searchEdit.lineEdit().setText(search)
-    browser.onSearchActivated()
-    return (True, None)
+    with timings.span("browser search", search):
+        browser.onSearchActivated()
+
+
+def select_cards(browser, cids: Sequence[int]) -> bool:
+    """Select the rows of cids and scroll to the first one, if they are
+    all in the browser's table. Return whether they are."""
+    wanted = set(cids)
+    rows = [row for row, cid in enumerate(browser.model.cards) if cid in wanted]
+    if not rows or len(rows) != len(wanted):
+        return False
+    table = browser.form.tableView
+    table.selectRow(rows[0])
+    selection = table.selectionModel()
+    for row in rows[1:]:
+        selection.select(
+            browser.model.index(row, 0),
+            QItemSelectionModel.Select | QItemSelectionModel.Rows)
+    table.scrollTo(browser.model.index(rows[0], 0))
+    return True
 
 
-gui_hooks.webview_did_receive_js_message.append(on_bridge_browser)
+router.register("Browser search", on_bridge_browser)
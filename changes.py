@@ -0,0 +1,57 @@
+"""Whether the collection may have changed, to know when a cache is stale.
+
+The collection mod is only updated when the collection is saved, so
+flushes and deletions observed through hooks are counted too. Bulk
+operations, such as adding tags, changing decks, find and replace or
+changing the note type, flush nothing, but the main window is reset or
+an undo step is recorded after them.
+"""
+from typing import Optional, Tuple
+
+from anki import hooks
+from aqt import gui_hooks, mw
+
+from .cache import LRUCache
+
+_generation = 0
+
+# Mod of the notes already asked for, valid while the stamp is
+# _note_mods_stamp.
+_note_mods = LRUCache(1000)
+_note_mods_stamp: Optional[Tuple[int, int, int]] = None
+
+
+def _changed(*args, **kwargs) -> None:
+    global _generation
+    _generation += 1
+
+
+hooks.note_will_flush.append(_changed)
+hooks.card_will_flush.append(_changed)
+hooks.notes_will_be_deleted.append(_changed)
+gui_hooks.profile_will_close.append(_changed)
+gui_hooks.state_did_reset.append(_changed)
+gui_hooks.undo_state_did_change.append(_changed)
+
+
+def stamp() -> Tuple[int, int, int]:
+    """A value which changes whenever the collection may have changed,
+    or the day changed, as searches such as is:due depend on it."""
+    return (mw.col.mod, _generation, mw.col.sched.today)
+
+
+def note_mod(nid: int) -> int:
+    """The mod of note nid.
+
+    It is read with one query on the notes table, without loading the
+    note, and not read again until the collection changes."""
+    global _note_mods_stamp
+    current = stamp()
+    if current != _note_mods_stamp:
+        _note_mods.clear()
+        _note_mods_stamp = current
+    mod = _note_mods.get(nid)
+    if mod is None:
+        mod = mw.col.db.scalar("select mod from notes where id = ?", nid)
+        _note_mods.put(nid, mod)
+    return mod
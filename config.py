@@ -1,6 +1,6 @@
 import sys
 
-from aqt import mw
+from aqt import gui_hooks, mw
 from aqt.utils import showWarning
 
 userOption = None
@@ -50,17 +50,63 @@ def getUserOption(keys=None, default=None, set_to_default_if_missing=True):
         return default
 
 
+# Number of times the configuration was actually written.
+write_count = 0
+# Whether userOption has changes not yet written.
+_dirty = False
+_flush_timer = None
+
+
 def writeConfig():
+    """Write the configuration soon.
+
+    All changes made until then are written at once, so that an
+    operation setting many options writes the configuration once."""
+    global _dirty, _flush_timer
+    _dirty = True
+    if _flush_timer is None:
+        # The configuration may be changed while no collection is open,
+        # e.g. when the add-on is loaded or the profile is switched.
+        _flush_timer = mw.progress.timer(
+            1000, _on_flush_timer, False, requiresCollection=False)
+
+
+def _on_flush_timer():
+    global _flush_timer
+    _flush_timer = None
+    flush()
+
+
+def flush():
+    """Write the configuration now, if it changed."""
+    global _dirty, write_count
+    _cancel_flush_timer()
+    if not _dirty or userOption is None:
+        return
+    _dirty = False
+    write_count += 1
     mw.addonManager.writeConfig(__name__, userOption)
 
 
+def _cancel_flush_timer():
+    global _flush_timer
+    if _flush_timer is not None:
+        _flush_timer.stop()
+        _flush_timer = None
+
+
 def update(_):
-    global userOption, fromName
+    global userOption, fromName, _dirty
+    # The configuration was replaced by the user, pending changes are
+    # lost.
+    _cancel_flush_timer()
+    _dirty = False
     userOption = None
     fromName = None
 
 
 mw.addonManager.setConfigUpdatedAction(__name__, update)
+gui_hooks.profile_will_close.append(flush)
 
 fromName = None
 
@@ -76,5 +122,7 @@ def getFromName(name):
 
 def setUserOption(key, value):
     _getUserOption()
+    if key in userOption and userOption[key] == value:
+        return
     userOption[key] = value
     writeConfig()
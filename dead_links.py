@@ -0,0 +1,87 @@
+"""Finds the links whose target was deleted, or whose search is empty."""
+from typing import List, NamedTuple
+
+from anki.lang import _
+from anki.utils import ids2str
+from aqt import mw
+from aqt.qt import QAction
+from aqt.utils import showInfo
+
+from . import link_index
+from .browser import open_browser
+from .guids import nid_of_guid
+from .links import guid_target
+
+# Number of ids checked by one query.
+CHUNK_SIZE = 10000
+
+
+class Report(NamedTuple):
+    # nids of the notes containing a link to a missing note or card
+    dead: List[int]
+    # nids of the notes containing a search link which finds no card
+    empty: List[int]
+    # number of distinct targets checked
+    checked: int
+
+
+def _missing(targeted: List[int], kind: str) -> List[int]:
+    """The ids of `targeted`, of `kind`, which do not exist anymore."""
+    table = "notes" if kind == "nid" else "cards"
+    missing = []
+    for start in range(0, len(targeted), CHUNK_SIZE):
+        chunk = targeted[start:start + CHUNK_SIZE]
+        existing = set(mw.col.db.list(
+            f"select id from {table} where id in {ids2str(chunk)}"))
+        missing.extend(id for id in chunk if id not in existing)
+    return missing
+
+
+def scan() -> Report:
+    """Check every link of the collection.
+
+    The link index is brought up to date, reading the fields by
+    chunks. Then each kind of ids is checked in a few batched queries,
+    and each distinct search is run once."""
+    dead = set()
+    checked = 0
+    for kind in ("nid", "cid"):
+        targeted = link_index.targeted_ids(kind)
+        checked += len(targeted)
+        dead.update(link_index.sources(kind, _missing(targeted, kind)))
+    for guid_query, nids in link_index.queries("guid").items():
+        checked += 1
+        if nid_of_guid(guid_target(guid_query)) is None:
+            dead.update(nids)
+    empty = set()
+    for query, nids in link_index.queries().items():
+        checked += 1
+        try:
+            found = mw.col.find_cards(query)
+        except Exception:
+            # An invalid search is as useless as an empty one.
+            found = []
+        if not found:
+            empty.update(nids)
+    return Report(sorted(dead), sorted(empty), checked)
+
+
+def check_links() -> None:
+    def on_done(future) -> None:
+        mw.progress.finish()
+        report = future.result()
+        showInfo(_("Checked %d link targets.\n"
+                   "%d notes link to a deleted note or card.\n"
+                   "%d notes link to a search without result.") % (
+            report.checked, len(report.dead), len(report.empty)))
+        broken = sorted(set(report.dead + report.empty))
+        if broken:
+            open_browser("nid:" + ",".join(str(nid) for nid in broken))
+
+    mw.progress.start(label=_("Checking links..."), immediate=True)
+    mw.taskman.run_in_background(scan, on_done)
+
+
+action = QAction(_("Check links"), mw)
+action.triggered.connect(check_links)
+mw.form.menuTools.addAction(action)
@@ -2,17 +2,29 @@ import json
 import os
 
 from anki.hooks import addHook
+from anki.utils import ids2str
 from aqt import mw
 from aqt.editor import Editor
-from aqt.qt import QDialog, QKeySequence, Qt
+from aqt.qt import (QDialog, QKeySequence, QLabel, QLineEdit, QListWidget,
+                    QListWidgetItem, Qt)
 
-from . import link
-from .config import getUserOption, setUserOption
+from . import note_index
+from .backlinks import show_backlinks
+from .config import flush, getUserOption, setUserOption
+from .guids import guid_of_nid
+from .links import link_html
+from .search import find_cards_in_background
 
 addon_path = os.path.dirname(__file__)
+# The search types, in the order of the dialog's combo box.
+SEARCH_TYPES = ["Note", "Card", "Query", "Guid"]
+# Number of matching cards whose sort field is shown in the link dialog.
+MATCHES_SHOWN = 3
 
 
 def create_link(editor):
+    # Only loaded when required, to keep Anki's start fast.
+    from . import link
     dialog = QDialog(editor.parentWindow, Qt.Dialog)
     form = link.Ui_Dialog()
     form.setupUi(dialog)
@@ -26,23 +38,33 @@ def create_link(editor):
         {"Browser": 0, "Previewer": 1}.get(getUserOption("Last open in", "Browser"), 0))
 
     # search
+    form.combo_search_type.addItem("Note GUID")
+    last_search_type = getUserOption("Last search type", "Note")
     form.combo_search_type.setCurrentIndex(
-        {"Note": 0, "Card": 1, "Query": 2}.get(getUserOption("Last search type", "Note"), 0))
+        SEARCH_TYPES.index(last_search_type)
+        if last_search_type in SEARCH_TYPES else 0)
+
+    def search_type() -> str:
+        return SEARCH_TYPES[form.combo_search_type.currentIndex()]
 
     # query
     def default() -> str:
-        search_type = ["Note", "Card",
-                       "Query"][form.combo_search_type.currentIndex()]
-        if search_type == "Note":
+        if search_type() == "Note":
             if editor.note:
                 return str(editor.note.id)
-        elif search_type == "Card":
+        elif search_type() == "Guid":
+            if editor.note:
+                return editor.note.guid
+        elif search_type() == "Card":
             if editor.card:
                 return str(editor.card.id)
             elif editor.note:
-                cards = editor.note.cards()
-                if cards:
-                    return str(cards[0].id)
+                # Only the id is required, do not load the cards.
+                cid = mw.col.db.scalar(
+                    "select id from cards where nid = ? order by ord limit 1",
+                    editor.note.id)
+                if cid:
+                    return str(cid)
         else:
             return getUserOption("Last query", "")
         return ""
@@ -54,14 +76,19 @@ def create_link(editor):
 
     form.button_current.clicked.connect(set_default)
 
+    stop_picking = add_note_picker(form, dialog)
+    stop_counting = add_match_count(form, dialog, lambda: link_query(
+        search_type(), form.line_search.text()))
+
     ##
     dialog.exec()
+    stop_picking()
+    stop_counting()
     mw.setupDialogGC(dialog)
     # Get values
 
     # Line of text
     text = form.line_display.text()
-    setUserOption("Last open in", text)
 
     # open
     open_in = ["Browser search",
@@ -69,24 +96,123 @@ def create_link(editor):
     setUserOption("Last open in", open_in)
 
     # search
-    search_type = ["Note", "Card",
-                   "Query"][form.combo_search_type.currentIndex()]
-    setUserOption("Last search type", search_type)
+    setUserOption("Last search type", search_type())
 
     # query
     query = form.line_search.text()
     setUserOption("Last query", query)
+    # Write the options chosen in this dialog at once.
+    flush()
 
     # Replace text
-    if search_type == "Note":
-        query = f"nid:{query}"
-    elif search_type == "Card":
-        query = f"cid:{query}"
-    text = f"""<a onclick="pycmd('{open_in}:{query}')">{text}</a>"""
+    text = link_html(open_in, link_query(search_type(), query), text)
     editor.web.eval(
         f"document.execCommand('insertHTML', false, {json.dumps(text)});")
 
 
+def link_query(search_type: str, query: str) -> str:
+    if search_type == "Note":
+        return f"nid:{query}"
+    elif search_type == "Card":
+        return f"cid:{query}"
+    elif search_type == "Guid":
+        return f"guid:{query}"
+    return query
+
+
+def add_match_count(form, dialog, current_query):
+    """A label showing how many cards current_query() finds, and the
+    sort field of the first ones, updated while the query is typed.
+
+    Only the last search matters: a search is started once the query
+    did not change for a moment, and the result of a former search is
+    ignored. Returns a function stopping the updates."""
+    label_count = QLabel(dialog)
+    label_count.setWordWrap(True)
+    form.formLayout.addRow("Matches", label_count)
+    timer = None
+    generation = 0
+
+    def on_found(cids, query_generation):
+        if query_generation != generation:
+            return
+        if cids is None:
+            label_count.setText("Invalid search")
+            return
+        first = cids[:MATCHES_SHOWN]
+        sort_field_of_cid = dict(mw.col.db.all(
+            f"select c.id, n.sfld from cards c join notes n on c.nid = n.id where c.id in {ids2str(first)}"))
+        # In the order of the search.
+        sort_fields = [sort_field_of_cid[cid] for cid in first if cid in sort_field_of_cid]
+        text = f"{len(cids)} cards"
+        if sort_fields:
+            text += ": " + ", ".join(str(sort_field) for sort_field in sort_fields)
+        label_count.setText(text)
+
+    def count():
+        nonlocal timer
+        timer = None
+        query_generation = generation
+        find_cards_in_background(
+            current_query(), lambda cids: on_found(cids, query_generation))
+
+    def on_query_changed(*args):
+        nonlocal timer, generation
+        generation += 1
+        label_count.setText("...")
+        if timer is not None:
+            timer.stop()
+        timer = mw.progress.timer(300, count, False)
+
+    def stop():
+        nonlocal generation
+        generation += 1
+        if timer is not None:
+            timer.stop()
+
+    form.line_search.textChanged.connect(on_query_changed)
+    form.combo_search_type.currentIndexChanged.connect(on_query_changed)
+    on_query_changed()
+    return stop
+
+
+def add_note_picker(form, dialog):
+    """A field searching notes by their sort field. Choosing a note
+    makes the link target it. Returns a function to call once the
+    dialog is closed."""
+    line_find = QLineEdit(dialog)
+    line_find.setPlaceholderText("Part of the sort field")
+    list_found = QListWidget(dialog)
+    list_found.setMaximumHeight(120)
+    form.formLayout.addRow("Find note", line_find)
+    form.formLayout.addRow("", list_found)
+
+    def on_text_changed(text):
+        list_found.clear()
+        for nid, sort_field in note_index.find_notes(text):
+            item = QListWidgetItem(sort_field)
+            item.setData(Qt.UserRole, nid)
+            list_found.addItem(item)
+
+    def on_built():
+        # What was typed before the index was built.
+        on_text_changed(line_find.text())
+
+    note_index.build_in_background(on_built)
+
+    def on_item_chosen(item):
+        nid = item.data(Qt.UserRole)
+        if SEARCH_TYPES[form.combo_search_type.currentIndex()] == "Guid":
+            form.line_search.setText(guid_of_nid(nid))
+        else:
+            form.combo_search_type.setCurrentIndex(0)
+            form.line_search.setText(str(nid))
+
+    line_find.textChanged.connect(on_text_changed)
+    list_found.itemClicked.connect(on_item_chosen)
+    return lambda: note_index.stop_waiting(on_built)
+
+
 def setupEditorButtonsFilter(buttons, editor):
     shortcut = getUserOption("Shortcut", "Ctrl+Shift+L")
     in_tip = QKeySequence(shortcut).toString(QKeySequence.NativeText)
@@ -99,6 +225,15 @@ def setupEditorButtonsFilter(buttons, editor):
             keys=shortcut
         )
     )
+    buttons.append(
+        editor.addButton(
+            None,
+            "backlinks_button",
+            lambda editor: show_backlinks(editor.note.id if editor.note else 0),
+            tip="Show the notes linking to this one",
+            label="Backlinks"
+        )
+    )
     return buttons
 
 
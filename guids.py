@@ -0,0 +1,108 @@
+"""Links to a note by its guid, which is kept when the note is imported
+in another collection, contrary to its id.
+
+guid: is not a search Anki knows. The guid of a link is replaced by the
+note's id, using a dictionary built in one query and kept up to date
+when notes are added or deleted.
+"""
+from typing import Dict, Optional
+
+from anki import hooks
+from anki.lang import _
+from anki.utils import ids2str
+from aqt import gui_hooks, mw
+from aqt.qt import QAction
+from aqt.utils import askUser, tooltip
+
+from .links import Link, direct_target, guid_target
+from .rewrite import rewrite_links
+
+_nids: Optional[Dict[str, int]] = None
+
+
+def _nid_by_guid() -> Dict[str, int]:
+    global _nids
+    if _nids is None:
+        _nids = dict(mw.col.db.all("select guid, id from notes"))
+    return _nids
+
+
+def nid_of_guid(guid: str) -> Optional[int]:
+    return _nid_by_guid().get(guid)
+
+
+def guid_of_nid(nid: int) -> Optional[str]:
+    return mw.col.db.scalar("select guid from notes where id = ?", nid)
+
+
+def to_nid_search(search: str) -> str:
+    """search, with a guid: search replaced by the equivalent nid:
+    search, which Anki knows."""
+    guid = guid_target(search)
+    if guid is None:
+        return search
+    # nid:0 finds nothing, as the note does not exist.
+    return f"nid:{nid_of_guid(guid) or 0}"
+
+
+def _to_guid(link: Link) -> Link:
+    target = direct_target(link.query)
+    if target is None or target[0] != "nid" or len(target[1]) != 1:
+        return link
+    guid = guid_of_nid(target[1][0])
+    if guid is None:
+        return link
+    return link._replace(query=f"guid:{guid}")
+
+
+def _to_nid(link: Link) -> Link:
+    guid = guid_target(link.query)
+    if guid is None:
+        return link
+    nid = nid_of_guid(guid)
+    if nid is None:
+        return link
+    return link._replace(query=f"nid:{nid}")
+
+
+def convert_links(to_guid: bool) -> None:
+    if to_guid:
+        question = _("Replace each link to a single note id by a link to its guid?")
+        label = _("Convert links to guid")
+    else:
+        question = _("Replace each link to a guid by a link to the note id?")
+        label = _("Convert links to note id")
+    if not askUser(question):
+        return
+    rewritten = rewrite_links(_to_guid if to_guid else _to_nid, label)
+    tooltip(_("%d notes changed.") % rewritten.changed)
+
+
+def _on_note_flushed(note) -> None:
+    if _nids is not None:
+        _nids[note.guid] = note.id
+
+
+def _on_notes_deleted(col, nids) -> None:
+    if _nids is None:
+        return
+    for guid in col.db.list(f"select guid from notes where id in {ids2str(nids)}"):
+        _nids.pop(guid, None)
+
+
+def _on_profile_closed() -> None:
+    global _nids
+    _nids = None
+
+
+hooks.note_will_flush.append(_on_note_flushed)
+hooks.notes_will_be_deleted.append(_on_notes_deleted)
+gui_hooks.profile_will_close.append(_on_profile_closed)
+
+action = QAction(_("Convert links to guid"), mw)
+action.triggered.connect(lambda: convert_links(True))
+mw.form.menuTools.addAction(action)
+
+action = QAction(_("Convert links to note id"), mw)
+action.triggered.connect(lambda: convert_links(False))
+mw.form.menuTools.addAction(action)
@@ -0,0 +1,226 @@
+"""An index of the links of the collection, to find backlinks quickly.
+
+It is a SQLite database in the add-on's user_files folder, one per
+profile. For each note, it contains the note mod when it was indexed,
+and the links it contains. The ids targeted by nid: and cid: links,
+and the nids of the guid: links, are indexed, so that the notes linking
+to a note are found with one indexed query.
+"""
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from anki import hooks
+from anki.utils import ids2str
+from aqt import gui_hooks, mw
+
+from .guids import nid_of_guid
+from .links import SQL_FILTER, direct_target, find_links, guid_target
+
+# Number of notes read from the collection at once.
+CHUNK_SIZE = 1000
+
+addon_path = os.path.dirname(__file__)
+
+_schema = """
+create table if not exists notes (nid integer primary key, mod integer not null);
+create table if not exists links (
+    nid integer not null, kind text not null, query text not null,
+    open_in text not null);
+create index if not exists ix_links_nid on links (nid);
+create table if not exists targets (
+    kind text not null, id integer not null, nid integer not null);
+create index if not exists ix_targets_id on targets (kind, id);
+create index if not exists ix_targets_nid on targets (nid);
+"""
+
+# Notes flushed since the last refresh. Notes are added on the main
+# thread and taken by refreshes in the background, under _dirty_lock.
+_dirty: Set[int] = set()
+_dirty_lock = threading.Lock()
+# Whether the index was compared with the whole collection since the
+# profile was opened.
+_synchronized = False
+# Held by the refresh in progress. A second refresh would do the same
+# work, and wait for the first one's write lock until it times out.
+_refresh_lock = threading.Lock()
+
+
+def _path() -> str:
+    folder = os.path.join(addon_path, "user_files")
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"link_index-{mw.pm.name}.sqlite")
+
+
+def _connect() -> sqlite3.Connection:
+    db = sqlite3.connect(_path())
+    db.executescript(_schema)
+    return db
+
+
+def refresh(nids: Optional[Iterable[int]] = None) -> None:
+    """Index the notes whose mod changed since they were indexed.
+
+    If nids is given, only those notes are considered, otherwise the
+    whole collection is compared with the index.
+    """
+    global _synchronized
+    db = _connect()
+    try:
+        if nids is None:
+            indexed = dict(db.execute("select nid, mod from notes"))
+            rows = mw.col.db.all("select id, mod from notes")
+        else:
+            nids = list(nids)
+            indexed = dict(db.execute(
+                f"select nid, mod from notes where nid in {ids2str(nids)}"))
+            rows = mw.col.db.all(
+                f"select id, mod from notes where id in {ids2str(nids)}")
+        changed = []
+        for nid, mod in rows:
+            if indexed.pop(nid, None) != mod:
+                changed.append(nid)
+        # What remains was deleted from the collection.
+        _forget(db, list(indexed))
+        for start in range(0, len(changed), CHUNK_SIZE):
+            _index(db, changed[start:start + CHUNK_SIZE])
+        db.commit()
+    finally:
+        db.close()
+    if nids is None:
+        _synchronized = True
+
+
+def _forget(db: sqlite3.Connection, nids: List[int]) -> None:
+    for table in ("notes", "links", "targets"):
+        db.execute(f"delete from {table} where nid in {ids2str(nids)}")
+
+
+def _index(db: sqlite3.Connection, nids: List[int]) -> None:
+    _forget(db, nids)
+    rows = mw.col.db.all(
+        f"select id, mod, {SQL_FILTER} from notes where id in {ids2str(nids)}")
+    db.executemany("insert into notes (nid, mod) values (?, ?)",
+                   [(nid, mod) for nid, mod, _ in rows])
+    with_links = [nid for nid, _, may_link in rows if may_link]
+    for nid, flds in mw.col.db.all(
+            f"select id, flds from notes where id in {ids2str(with_links)}"):
+        for link in find_links(flds):
+            guid = guid_target(link.query)
+            if guid is not None:
+                kind = "guid"
+                target_nid = nid_of_guid(guid)
+                target = None if target_nid is None else ("nid", [target_nid])
+            else:
+                target = direct_target(link.query)
+                kind = "query" if target is None else target[0]
+            db.execute(
+                "insert into links (nid, kind, query, open_in) values (?, ?, ?, ?)",
+                (nid, kind, link.query, link.open_in))
+            if target is not None:
+                db.executemany(
+                    "insert into targets (kind, id, nid) values (?, ?, ?)",
+                    [(target[0], id, nid) for id in target[1]])
+
+
+def _take_dirty() -> Set[int]:
+    global _dirty
+    with _dirty_lock:
+        dirty, _dirty = _dirty, set()
+    return dirty
+
+
+def _refresh_if_required() -> None:
+    """Bring the index up to date, after the refresh in progress on
+    another thread, if any."""
+    with _refresh_lock:
+        if not _synchronized:
+            # The flushed notes are compared with the collection too.
+            _take_dirty()
+            refresh()
+        else:
+            dirty = _take_dirty()
+            if dirty:
+                try:
+                    refresh(dirty)
+                except Exception:
+                    with _dirty_lock:
+                        _dirty.update(dirty)
+                    raise
+
+
+def backlinks(nid: int) -> List[int]:
+    """The nids of the notes containing a nid: or cid: link to note nid."""
+    _refresh_if_required()
+    cids = mw.col.db.list("select id from cards where nid = ?", nid)
+    db = _connect()
+    try:
+        return [source for source, in db.execute(
+            f"""select distinct nid from targets
+            where (kind = 'nid' and id = ?) or (kind = 'cid' and id in {ids2str(cids)})
+            order by nid""", (nid,))]
+    finally:
+        db.close()
+
+
+def targeted_ids(kind: str) -> List[int]:
+    """The ids targeted by some link of kind "nid" or "cid"."""
+    _refresh_if_required()
+    db = _connect()
+    try:
+        return [id for id, in db.execute(
+            "select distinct id from targets where kind = ?", (kind,))]
+    finally:
+        db.close()
+
+
+def sources(kind: str, ids: Iterable[int]) -> List[int]:
+    """The nids of the notes containing a link of kind "nid" or "cid"
+    to one of ids."""
+    db = _connect()
+    try:
+        return [nid for nid, in db.execute(
+            f"""select distinct nid from targets
+            where kind = ? and id in {ids2str(ids)} order by nid""", (kind,))]
+    finally:
+        db.close()
+
+
+def queries(kind: str = "query") -> Dict[str, List[int]]:
+    """For each query of a link of kind "query" (neither nid: nor cid:
+    nor guid:) or "guid", the nids of the notes containing it."""
+    _refresh_if_required()
+    db = _connect()
+    try:
+        result: Dict[str, List[int]] = {}
+        for query, nid in db.execute(
+                "select distinct query, nid from links where kind = ?", (kind,)):
+            result.setdefault(query, []).append(nid)
+        return result
+    finally:
+        db.close()
+
+
+def _on_note_flushed(note) -> None:
+    with _dirty_lock:
+        _dirty.add(note.id)
+
+
+def _on_profile_opened() -> None:
+    global _synchronized
+    _synchronized = False
+    _take_dirty()
+    # Build the index while the user does something else.
+    mw.taskman.run_in_background(
+        _refresh_if_required, lambda future: future.result())
+
+
+def _on_sync_finished() -> None:
+    global _synchronized
+    _synchronized = False
+
+
+hooks.note_will_flush.append(_on_note_flushed)
+gui_hooks.profile_did_open.append(_on_profile_opened)
+gui_hooks.sync_did_finish.append(_on_sync_finished)
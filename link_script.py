@@ -0,0 +1,37 @@
+"""Loads web/links.js, which opens the links when clicked, in every
+webview: reviewer, previewers, editor, and any other showing fields.
+
+web/snippets.js, which describes the link targets on hover, is loaded
+everywhere but in the editor, where the titles it sets would be saved
+in the fields."""
+from anki.lang import _
+from aqt import gui_hooks, mw
+from aqt.editor import Editor
+from aqt.qt import QAction
+from aqt.utils import askUser, tooltip
+
+from .links import to_data_attributes
+from .rewrite import rewrite_fields
+
+mw.addonManager.setWebExports(__name__, r"web/.*\.js")
+_web = f"/_addons/{mw.addonManager.addonFromModule(__name__)}/web"
+
+
+def on_webview_will_set_content(web_content, context) -> None:
+    web_content.js.append(f"{_web}/links.js")
+    if not isinstance(context, Editor):
+        web_content.js.append(f"{_web}/snippets.js")
+
+
+def convert_onclick_links() -> None:
+    if not askUser(_("Rewrite the links created by former versions of this add-on in the current format?")):
+        return
+    rewritten = rewrite_fields(to_data_attributes, _("Convert links format"))
+    tooltip(_("%d notes changed.") % rewritten.changed)
+
+
+gui_hooks.webview_will_set_content.append(on_webview_will_set_content)
+
+action = QAction(_("Convert links format"), mw)
+action.triggered.connect(convert_onclick_links)
+mw.form.menuTools.addAction(action)
@@ -0,0 +1,113 @@
+"""The links written in fields, and how to find them back.
+
+A link is written as
+    <a data-link-open="OPEN_IN" data-link-query="QUERY">text</a>
+and web/links.js, loaded in every webview, sends "OPEN_IN:QUERY" to
+Python when it is clicked. Links written by former versions call pycmd
+from an onclick attribute; they are still recognized.
+"""
+import html
+import re
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Condition on the notes table, true for the notes which may contain a
+# link. Used to only read those notes.
+SQL_FILTER = "(flds like '%data-link-query=%' or flds like '%pycmd(%')"
+
+# A start tag <a ...>. Quoted attribute values may contain ">", as the
+# editor does not escape it.
+_tag_re = re.compile(r"""<a\b(?:[^>"']|"[^"]*"|'[^']*')*>""", re.IGNORECASE)
+_open_re = re.compile(r'\bdata-link-open="(Browser search|Previewer)"')
+_query_re = re.compile(r'\bdata-link-query="([^"]*)"')
+_onclick_re = re.compile(r"""pycmd\('(Browser search|Previewer):(.*?)'\)""")
+_onclick_attribute_re = re.compile(
+    r"onclick=\"pycmd\('(Browser search|Previewer):(.*?)'\)\"")
+_direct_re = re.compile(r"^(nid|cid):(\d+(?:,\d+)*)$")
+_guid_re = re.compile(r"^guid:(\S+)$")
+
+
+class Link(NamedTuple):
+    # "Browser search" or "Previewer"
+    open_in: str
+    query: str
+
+
+def _attributes(link: Link) -> str:
+    return (f'data-link-open="{link.open_in}" '
+            f'data-link-query="{html.escape(link.query)}"')
+
+
+def link_html(open_in: str, query: str, text: str) -> str:
+    return f"<a {_attributes(Link(open_in, query))}>{text}</a>"
+
+
+def _link(match) -> Link:
+    open_in, query = match.groups()
+    return Link(open_in, html.unescape(query))
+
+
+def _tag_link(tag: str) -> Optional[Link]:
+    """The link of a start tag with both data attributes, in any order
+    and among any other attributes."""
+    open_in = _open_re.search(tag)
+    query = _query_re.search(tag)
+    if open_in is None or query is None:
+        return None
+    return Link(open_in.group(1), html.unescape(query.group(1)))
+
+
+def find_links(text: str) -> Iterator[Link]:
+    for match in _tag_re.finditer(text):
+        link = _tag_link(match.group())
+        if link is not None:
+            yield link
+    for match in _onclick_re.finditer(text):
+        yield _link(match)
+
+
+def replace_links(text: str, replace: Callable[[Link], Link]) -> str:
+    """text, where each link is replaced by replace(link)."""
+    def replace_data(match):
+        tag = match.group()
+        link = _tag_link(tag)
+        if link is None:
+            return tag
+        link = replace(link)
+        # Functions, so that backslashes are not interpreted.
+        tag = _open_re.sub(
+            lambda match: f'data-link-open="{link.open_in}"', tag, count=1)
+        return _query_re.sub(
+            lambda match: f'data-link-query="{html.escape(link.query)}"', tag, count=1)
+
+    def replace_onclick(match):
+        link = replace(_link(match))
+        # Within a double quoted attribute and a single quoted string.
+        query = html.escape(link.query, quote=False).replace('"', "&quot;")
+        return f"pycmd('{link.open_in}:{query}')"
+    text = _tag_re.sub(replace_data, text)
+    return _onclick_re.sub(replace_onclick, text)
+
+
+def to_data_attributes(text: str) -> str:
+    """text, where the links calling pycmd from onclick are written
+    with data attributes."""
+    return _onclick_attribute_re.sub(
+        lambda match: _attributes(_link(match)), text)
+
+
+def direct_target(query: str) -> Optional[Tuple[str, List[int]]]:
+    """("nid", nids) or ("cid", cids) if query is only a list of ids of
+    this kind. None otherwise."""
+    match = _direct_re.match(query)
+    if match is None:
+        return None
+    kind, ids = match.groups()
+    return kind, [int(id) for id in ids.split(",")]
+
+
+def guid_target(query: str) -> Optional[str]:
+    """The guid of a guid: link. None for any other query."""
+    match = _guid_re.match(query)
+    if match is None:
+        return None
+    return match.group(1)
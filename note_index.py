@@ -0,0 +1,174 @@
+"""Finds notes from a part of their sort field, while the user types.
+
+The lowercased sort fields of all notes are joined in one string,
+each preceded by a newline. A search is then a few calls to str.find,
+done in C, and a bisection in the array of the fields' offsets, so it
+takes a few milliseconds even on hundreds of thousands of notes.
+
+The index is built in the background the first time it is required,
+and nothing is found until then. Notes edited, added or deleted later
+are kept aside, and the index is rebuilt once there are too many of
+them.
+"""
+from array import array
+from bisect import bisect_right
+from typing import Callable, Dict, List, Optional, Tuple
+
+from anki import hooks
+from anki.utils import ids2str, stripHTMLMedia
+from aqt import gui_hooks, mw
+
+# Number of changed notes after which the index is rebuilt.
+MAX_CHANGED = 5000
+
+
+def _normalize(text) -> str:
+    return str(text).lower().replace("\n", " ")
+
+
+class SortFieldIndex:
+    def __init__(self):
+        nids = array("q")
+        starts = array("q")
+        parts = []
+        position = 0
+        for nid, sfld in mw.col.db.all("select id, sfld from notes"):
+            text = _normalize(sfld)
+            nids.append(nid)
+            starts.append(position)
+            parts.append(text)
+            position += len(text) + 1
+        self._nids = nids
+        self._starts = starts
+        self._blob = "\n" + "\n".join(parts)
+        # Lowercased sort field of the notes changed since the index
+        # was built, None for the deleted ones.
+        self.changed: Dict[int, Optional[str]] = {}
+
+    def _find(self, needle: str, offset: int, limit: int, found: List[int]) -> None:
+        """Add to found the nids whose text contains needle, starting
+        at `offset` in it, until found has `limit` elements."""
+        position = self._blob.find(needle)
+        while position != -1 and len(found) < limit:
+            # position + offset is in the text starting at starts[index] + 1
+            index = bisect_right(self._starts, position + offset - 1) - 1
+            nid = self._nids[index]
+            if nid not in self.changed and nid not in found:
+                found.append(nid)
+            # Go to the end of this note's text.
+            end = self._blob.find("\n", position + offset)
+            if end == -1:
+                break
+            position = self._blob.find(needle, end)
+
+    def search(self, text: str, limit: int) -> List[int]:
+        """The nids of at most `limit` notes whose sort field contains
+        text. Those starting with text come first."""
+        text = _normalize(text)
+        if not text:
+            return []
+        found: List[int] = []
+        for nid, changed in self.changed.items():
+            if changed is not None and changed.startswith(text):
+                found.append(nid)
+        self._find("\n" + text, 1, limit, found)
+        for nid, changed in self.changed.items():
+            if changed is not None and text in changed and nid not in found:
+                found.append(nid)
+        self._find(text, 0, limit, found)
+        return found[:limit]
+
+
+_index: Optional[SortFieldIndex] = None
+# Whether an index is being built in the background, the notes changed
+# meanwhile, and the functions to call once it is built.
+_building = False
+_changed_while_building: Dict[int, Optional[str]] = {}
+_waiting: List[Callable[[], None]] = []
+# Incremented when the profile is closed, making the index being built
+# stale.
+_generation = 0
+
+
+def find_notes(text: str, limit: int = 20) -> List[Tuple[int, str]]:
+    """The (nid, sort field) of the notes whose sort field contains text.
+
+    Nothing is found until the index is built. An index with too many
+    changed notes is still used while it is rebuilt."""
+    if _index is None or len(_index.changed) > MAX_CHANGED:
+        build_in_background()
+    if _index is None:
+        return []
+    nids = _index.search(text, limit)
+    sort_fields = dict(mw.col.db.all(
+        f"select id, sfld from notes where id in {ids2str(nids)}"))
+    return [(nid, str(sort_fields[nid])) for nid in nids if nid in sort_fields]
+
+
+def build_in_background(on_built: Optional[Callable[[], None]] = None) -> None:
+    """Build the index if required, before the user starts typing.
+
+    on_built is called on the main thread once the index is built, if
+    it was not, unless stop_waiting(on_built) was called before."""
+    global _building
+    if _index is not None and len(_index.changed) <= MAX_CHANGED:
+        return
+    if on_built is not None:
+        _waiting.append(on_built)
+    if _building:
+        return
+    _building = True
+    generation = _generation
+
+    def on_done(future) -> None:
+        global _index, _building, _waiting
+        if generation != _generation:
+            return
+        _building = False
+        index = future.result()
+        index.changed.update(_changed_while_building)
+        _changed_while_building.clear()
+        _index = index
+        waiting, _waiting = _waiting, []
+        for func in waiting:
+            func()
+
+    mw.taskman.run_in_background(SortFieldIndex, on_done)
+
+
+def stop_waiting(on_built: Callable[[], None]) -> None:
+    if on_built in _waiting:
+        _waiting.remove(on_built)
+
+
+def _changed(nid: int, sort_field: Optional[str]) -> None:
+    if _index is not None:
+        _index.changed[nid] = sort_field
+    if _building:
+        _changed_while_building[nid] = sort_field
+
+
+def _on_note_flushed(note) -> None:
+    if _index is None and not _building:
+        return
+    sort_field = note.fields[note.model()["sortf"]]
+    _changed(note.id, _normalize(stripHTMLMedia(sort_field)))
+
+
+def _on_notes_deleted(col, nids) -> None:
+    for nid in nids:
+        _changed(nid, None)
+
+
+def _on_profile_closed() -> None:
+    global _index, _building, _generation
+    _index = None
+    _building = False
+    _changed_while_building.clear()
+    _waiting.clear()
+    _generation += 1
+
+
+hooks.note_will_flush.append(_on_note_flushed)
+hooks.notes_will_be_deleted.append(_on_notes_deleted)
+gui_hooks.profile_will_close.append(_on_profile_closed)
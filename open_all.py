@@ -0,0 +1,138 @@
+"""Opens the targets of all the links of a card in one previewer.
+
+The nid:, cid: and guid: targets are read with one query on the cards
+table, and the other searches are run as one search joining them with
+"or". Cards targeted by several links are shown once: first the direct
+targets, in the order of the links, then the cards found by the
+searches. If the joined search is invalid, the searches are run one by
+one, so that only the invalid ones are ignored.
+"""
+import time
+from array import array
+from typing import Callable, Dict, List, Optional, Sequence
+
+from anki.lang import _
+from anki.utils import ids2str
+from aqt import gui_hooks, mw
+from aqt.utils import tooltip
+
+from .guids import nid_of_guid
+from .links import direct_target, find_links, guid_target
+from .search import find_cards_in_background
+
+
+def link_queries(card) -> List[str]:
+    """The queries of the links of card's note, without duplicates."""
+    return list(dict.fromkeys(
+        link.query for field in card.note().fields for link in find_links(field)))
+
+
+def combined_search(queries: Sequence[str]) -> str:
+    return " or ".join(f"({query})" for query in queries)
+
+
+def direct_cids(queries: Sequence[str]) -> List[int]:
+    """The cids targeted by the nid:, cid: and guid: queries, in order,
+    read with one query."""
+    targets = []
+    for query in queries:
+        guid = guid_target(query)
+        if guid is not None:
+            nid = nid_of_guid(guid)
+            if nid is not None:
+                targets.append(("nid", [nid]))
+            continue
+        target = direct_target(query)
+        if target is not None:
+            targets.append(target)
+    nids = [id for kind, ids in targets if kind == "nid" for id in ids]
+    cids = [id for kind, ids in targets if kind == "cid" for id in ids]
+    if not nids and not cids:
+        return []
+    cids_of_nid: Dict[int, List[int]] = {}
+    existing = set()
+    for cid, nid in mw.col.db.all(
+            f"""select id, nid from cards where nid in {ids2str(nids)}
+            or id in {ids2str(cids)} order by nid, ord"""):
+        cids_of_nid.setdefault(nid, []).append(cid)
+        existing.add(cid)
+    found = []
+    for kind, ids in targets:
+        for id in ids:
+            if kind == "nid":
+                found.extend(cids_of_nid.get(id, []))
+            elif id in existing:
+                found.append(id)
+    return found
+
+
+def find_each(searches: Sequence[str],
+              on_done: Callable[[List[int], List[str]], None]) -> None:
+    """Run searches one after the other in the background, then call
+    on_done with the cids found, in order, and the invalid searches."""
+    found: List[int] = []
+    invalid: List[str] = []
+
+    def find(index: int) -> None:
+        if index == len(searches):
+            on_done(found, invalid)
+            return
+
+        def on_found(cids: Optional[Sequence[int]]) -> None:
+            if cids is None:
+                invalid.append(searches[index])
+            else:
+                found.extend(cids)
+            find(index + 1)
+
+        find_cards_in_background(searches[index], on_found)
+
+    find(0)
+
+
+def open_all_links(card, parent=None) -> None:
+    """Open one previewer showing the targets of all the links of card."""
+    clicked = time.perf_counter()
+    queries = link_queries(card)
+    if not queries:
+        tooltip(_("This card has no link."))
+        return
+    cids = direct_cids(queries)
+    searches = [query for query in queries
+                if guid_target(query) is None and direct_target(query) is None]
+
+    def on_each_found(found: List[int], invalid: List[str]) -> None:
+        if invalid:
+            tooltip(_("Invalid searches are ignored: %s") % ", ".join(invalid))
+        on_found(found)
+
+    def on_found(found: Optional[Sequence[int]]) -> None:
+        if found is None:
+            # Find which searches are invalid.
+            find_each(searches, on_each_found)
+            return
+        # Deduplicated, in order.
+        all_cids = list(dict.fromkeys([*cids, *found]))
+        if not all_cids:
+            tooltip(_("No card found."))
+            return
+        from .previewer_lib import PreviewerListCards
+        previewer = PreviewerListCards(array("q", all_cids), parent or mw, mw)
+        previewer._clicked = clicked
+        previewer._openPreview()
+
+    if searches:
+        find_cards_in_background(combined_search(searches), on_found)
+    else:
+        on_found([])
+
+
+def _on_reviewer_context_menu(reviewer, menu) -> None:
+    card = reviewer.card
+    if card is None:
+        return
+    action = menu.addAction(_("Open all links"))
+    action.triggered.connect(lambda: open_all_links(card))
+
+
+gui_hooks.reviewer_will_show_context_menu.append(_on_reviewer_context_menu)
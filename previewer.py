@@ -1,24 +1,39 @@
-from aqt import gui_hooks, mw
-
-from .previewer_lib import PreviewerListCards, PreviewerSingleCard
-
-
-def on_bridge_browser(handled, cmd, context):
-    prefix = "Previewer:"
-    if not cmd.startswith(prefix):
-        return handled
-    search = cmd[len(prefix):]
-    cids = mw.col.find_cards(search)
-    cards = [mw.col.getCard(cid) for cid in cids]
-    if len(cards) == 0:
-        return
-    elif len(cards) == 1:
-        card = cards[0]
-        previewer = PreviewerSingleCard(card, context, mw)
-    else:
-        previewer = PreviewerListCards(cards, context, mw)
-    previewer._openPreview()
-    return (True, None)
-
-
-gui_hooks.webview_did_receive_js_message.append(on_bridge_browser)
+import time
+from array import array
+
+from aqt import mw
+
+from . import router, timings
+from .search import resolve
+
+
+def on_bridge_browser(search, context):
+    # The previewer requires webview, sound and theme code. It is
+    # only loaded the first time a link is clicked.
+    from .previewer_lib import PreviewerListCards, PreviewerSingleCard
+    clicked = time.perf_counter()
+    previewer = None
+
+    def on_page(cids, last):
+        # Open as soon as the first page is known, and add the
+        # following ones to it. Cards are loaded lazily by the
+        # previewer, only keep their ids.
+        nonlocal previewer
+        if previewer is not None:
+            previewer.extend(cids)
+            return
+        if len(cids) == 0:
+            return
+        elif len(cids) == 1 and last:
+            with timings.span("load card"):
+                card = mw.col.getCard(cids[0])
+            previewer = PreviewerSingleCard(card, context, mw)
+        else:
+            previewer = PreviewerListCards(array("q", cids), context, mw)
+        previewer._clicked = clicked
+        previewer._openPreview()
+
+    resolve(search, on_page)
+
+
+router.register("Previewer", on_bridge_browser)
@@ -2,11 +2,11 @@ import json
 import re
 import time
 from dataclasses import dataclass
-from typing import Any, List, Optional, Union
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
 
 from anki.cards import Card
 from anki.lang import _
-from aqt import AnkiQt, gui_hooks
+from aqt import AnkiQt, gui_hooks, mw
 from aqt.qt import (QAbstractItemView, QCheckBox, QDialog, QDialogButtonBox,
                     QKeySequence, Qt, QVBoxLayout, QWidget)
 from aqt.sound import av_player, play_clicked_audio
@@ -14,6 +14,44 @@ from aqt.theme import theme_manager
 from aqt.utils import restoreGeom, saveGeom
 from aqt.webview import AnkiWebView
 
+from . import timings
+from .backlinks import show_backlinks
+from .cache import LRUCache
+from .changes import note_mod, stamp
+from .config import getUserOption
+from .open_all import open_all_links
+
+# Rendered (javascript function, html), indexed by the
+# (side, cid, note mod) returned by _previewStateAndMod. Templates,
+# decks and cards may change without changing the note mod, so it is
+# only valid while the collection's stamp is _render_cache_stamp.
+render_cache = LRUCache(getUserOption("Previewer render cache size", 50))
+_render_cache_stamp: Optional[Tuple[int, int, int]] = None
+timings.add_cache("Previewer renders", render_cache.stats)
+
+# Bounds of the time between the start of two renders, in seconds.
+# Within them, it is RENDER_INTERVAL_FACTOR times the measured time of
+# a render, so that holding an arrow key shows as many cards as can be
+# rendered while keeping the window responsive, without queuing renders.
+MIN_RENDER_INTERVAL = 0.03
+MAX_RENDER_INTERVAL = 0.3
+RENDER_INTERVAL_FACTOR = 3
+# Moving average of the time of a render, in seconds. It depends on the
+# collection's templates rather than on the window, so it is shared by
+# all previewers.
+_render_seconds = 0.0
+
+
+def _valid_render_cache() -> LRUCache:
+    """render_cache, emptied if the collection may have changed since
+    it was filled."""
+    global _render_cache_stamp
+    current = stamp()
+    if current != _render_cache_stamp:
+        render_cache.clear()
+        _render_cache_stamp = current
+    return render_cache
+
 
 @dataclass
 class PreviewDialog:
@@ -21,11 +59,124 @@ class PreviewDialog:
     parent: QWidget
 
 
+_previewer_js = [
+    "jquery.js",
+    "browsersel.js",
+    "mathjax/conf.js",
+    "mathjax/MathJax.js",
+    "reviewer.js",
+]
+
+
+@dataclass
+class PreviewWindow:
+    """A previewer window whose webview may already have loaded the
+    reviewer page."""
+    dialog: QDialog
+    vbox: QVBoxLayout
+    web: AnkiWebView
+    context: PreviewDialog
+
+
+class PreviewWindowPool:
+    """Previewer windows kept hidden, with their page loaded, so that
+    opening a link only has to show a card.
+
+    Closed previewers give their window back instead of destroying it.
+    The windows in use count in the pool's size, as they are expected
+    back: with the default size, 2, a link clicked in an open previewer
+    opens in a spare window too. The spare windows are destroyed once
+    unused for a while."""
+
+    def __init__(self):
+        self._spare: List[PreviewWindow] = []
+        self._in_use = 0
+        self._idle_timer = None
+
+    def size(self) -> int:
+        return getUserOption("Previewer pool size", 2)
+
+    def acquire(self) -> PreviewWindow:
+        if self._spare:
+            window = self._spare.pop()
+        else:
+            window = self._create()
+        self._in_use += 1
+        if self.size():
+            # Be ready for the next link.
+            mw.progress.timer(1000, self.warm, False)
+        return window
+
+    def release(self, window: PreviewWindow) -> None:
+        window.dialog.finished.disconnect()
+        self._in_use -= 1
+        if len(self._spare) + self._in_use < self.size():
+            # Do not show the previous card when the window is reused.
+            window.web.eval("_showQuestion('', '');")
+            self._spare.append(window)
+            self._restart_idle_timer()
+        else:
+            window.dialog.deleteLater()
+
+    def warm(self) -> None:
+        while len(self._spare) + self._in_use < self.size():
+            self._spare.append(self._create())
+        self._restart_idle_timer()
+
+    def clear(self) -> None:
+        self._cancel_idle_timer()
+        for window in self._spare:
+            window.dialog.deleteLater()
+        self._spare = []
+
+    def _create(self) -> PreviewWindow:
+        dialog = QDialog(None, Qt.Window)
+        dialog.silentlyClose = True
+        vbox = QVBoxLayout()
+        vbox.setContentsMargins(0, 0, 0, 0)
+        web = AnkiWebView(title="previewer")
+        vbox.addWidget(web)
+        dialog.setLayout(vbox)
+        # The parent is set by the previewer using the window.
+        context = PreviewDialog(dialog=dialog, parent=None)
+        with timings.span("stdHtml"):
+            web.stdHtml(
+                mw.reviewer.revHtml(),
+                css=["reviewer.css"],
+                js=_previewer_js,
+                context=context,
+            )
+        return PreviewWindow(dialog, vbox, web, context)
+
+    def _restart_idle_timer(self) -> None:
+        self._cancel_idle_timer()
+        self._idle_timer = mw.progress.timer(
+            getUserOption("Previewer pool idle seconds", 600) * 1000,
+            self.clear, False)
+
+    def _cancel_idle_timer(self) -> None:
+        if self._idle_timer:
+            self._idle_timer.stop()
+            self._idle_timer = None
+
+
+pool = PreviewWindowPool()
+gui_hooks.profile_will_close.append(pool.clear)
+
+
 class Previewer:
     _lastPreviewState = None
     _previewCardChanged = False
     _lastPreviewRender: Union[int, float] = 0
     _previewTimer = None
+    # Whether the webview has not yet run the last card sent to it, and
+    # whether the card should be rendered again once it has.
+    _previewRendering = False
+    _previewRenderRequested = False
+    _window: Optional[PreviewWindow] = None
+    # perf_counter() when the link was clicked, until its first card
+    # is shown.
+    _clicked: Optional[float] = None
 
     def __init__(self, parent: QWidget, mw: AnkiQt):
         self.parent = parent
@@ -37,21 +188,20 @@ class Previewer:
     def _openPreview(self):
         self._previewState = "question"
         self._lastPreviewState = None
+        self._previewRendering = False
         self._create_gui()
         self._setupPreviewWebview()
         self._renderPreview(True)
         self._previewWindow.show()
 
     def _create_gui(self):
-        self._previewWindow = QDialog(None, Qt.Window)
+        self._window = pool.acquire()
+        self._previewWindow = self._window.dialog
         self._previewWindow.setWindowTitle(_("Preview"))
 
         self._previewWindow.finished.connect(self._onPreviewFinished)
-        self._previewWindow.silentlyClose = True
-        self.vbox = QVBoxLayout()
-        self.vbox.setContentsMargins(0, 0, 0, 0)
-        self._previewWeb = AnkiWebView(title="previewer")
-        self.vbox.addWidget(self._previewWeb)
+        self.vbox = self._window.vbox
+        self._previewWeb = self._window.web
         self.bbox = QDialogButtonBox()
 
         self._previewReplay = self.bbox.addButton(
@@ -72,14 +222,37 @@ class Previewer:
         self.previewShowBothSides.setChecked(self._previewBothSides)
         self.previewShowBothSides.toggled.connect(self._onPreviewShowBothSides)
 
+        self._backlinks = self.bbox.addButton(
+            _("Backlinks"), QDialogButtonBox.ActionRole
+        )
+        self._backlinks.setAutoDefault(False)
+        self._backlinks.setToolTip(_("Show the notes linking to this one"))
+        self._backlinks.clicked.connect(self._onBacklinks)
+
+        self._allLinks = self.bbox.addButton(
+            _("All links"), QDialogButtonBox.ActionRole
+        )
+        self._allLinks.setAutoDefault(False)
+        self._allLinks.setToolTip(_("Preview the targets of all links of this card"))
+        self._allLinks.clicked.connect(self._onAllLinks)
+
         self.vbox.addWidget(self.bbox)
-        self._previewWindow.setLayout(self.vbox)
         restoreGeom(self._previewWindow, "preview")
 
     def _onPreviewFinished(self, ok):
         saveGeom(self._previewWindow, "preview")
         self.mw.progress.timer(100, self._onClosePreview, False)
 
+    def _onBacklinks(self):
+        c = self.card()
+        if c:
+            show_backlinks(c.nid)
+
+    def _onAllLinks(self):
+        c = self.card()
+        if c:
+            open_all_links(c, self.parent)
+
     def _onReplayAudio(self):
         self.mw.reviewer.replayAudio(self)
 
@@ -89,24 +262,18 @@ class Previewer:
             self._onClosePreview()
 
     def _onClosePreview(self):
+        if self._window is not None:
+            # The buttons belong to this previewer, the window is reused.
+            self.bbox.setParent(None)
+            self.bbox.deleteLater()
+            pool.release(self._window)
+            self._window = None
         self._previewWindow = None
 
     def _setupPreviewWebview(self):
-        jsinc = [
-            "jquery.js",
-            "browsersel.js",
-            "mathjax/conf.js",
-            "mathjax/MathJax.js",
-            "reviewer.js",
-        ]
-        web_context = PreviewDialog(
-            dialog=self._previewWindow, parent=self.parent)
-        self._previewWeb.stdHtml(
-            self.mw.reviewer.revHtml(),
-            css=["reviewer.css"],
-            js=jsinc,
-            context=web_context,
-        )
+        # The page was loaded by the pool.
+        web_context = self._window.context
+        web_context.parent = self.parent
         self._previewWeb.set_bridge_command(
             self._on_preview_bridge_cmd, web_context,
         )
@@ -116,20 +283,29 @@ class Previewer:
             play_clicked_audio(cmd, self.card())
 
     def _renderPreview(self, cardChanged=False):
-        self._cancelPreviewTimer()
         # Keep track of whether _renderPreview() has ever been called
         # with cardChanged=True since the last successful render
         self._previewCardChanged |= cardChanged
+        if self._previewTimer or self._previewRendering:
+            # The scheduled render, or the one following the render in
+            # progress, shows the card current by then. The cards moved
+            # through in the meantime are never loaded.
+            self._previewRenderRequested = True
+            return
         # avoid rendering in quick succession
-        elapMS = int((time.time() - self._lastPreviewRender) * 1000)
-        delay = 300
-        if elapMS < delay:
+        elapsed = time.perf_counter() - self._lastPreviewRender
+        interval = self._renderInterval()
+        if elapsed < interval:
             self._previewTimer = self.mw.progress.timer(
-                delay - elapMS, self._renderScheduledPreview, False
+                int((interval - elapsed) * 1000), self._renderScheduledPreview, False
             )
         else:
             self._renderScheduledPreview()
 
+    def _renderInterval(self) -> float:
+        return min(MAX_RENDER_INTERVAL, max(
+            MIN_RENDER_INTERVAL, RENDER_INTERVAL_FACTOR * _render_seconds))
+
     def _cancelPreviewTimer(self):
         if self._previewTimer:
             self._previewTimer.stop()
@@ -137,7 +313,8 @@ class Previewer:
 
     def _renderScheduledPreview(self) -> None:
         self._cancelPreviewTimer()
-        self._lastPreviewRender = time.time()
+        self._previewRenderRequested = False
+        self._lastPreviewRender = time.perf_counter()
 
         if not self._previewWindow:
             return
@@ -158,13 +335,14 @@ class Previewer:
                 # nothing has changed, avoid refreshing
                 return
 
-            # need to force reload even if answer
-            txt = c.q(reload=True)
-
-            if self._previewState == "answer":
-                func = "_showAnswer"
-                txt = c.a()
-            txt = re.sub(r"\[\[type:[^]]+\]\]", "", txt)
+            cache = _valid_render_cache()
+            rendered = cache.get(currentState)
+            if rendered is None:
+                with timings.span("render card"):
+                    rendered = self._render_card(
+                        c, self._previewState, reload=self._needsReload(c))
+                cache.put(currentState, rendered)
+            func, txt = rendered
 
             bodyclass = theme_manager.body_classes_for_card_ord(c.ord)
 
@@ -185,15 +363,49 @@ class Previewer:
             else:
                 av_player.clear_queue_and_maybe_interrupt()
 
-            txt = self.mw.prepare_card_text_for_display(txt)
-            txt = gui_hooks.card_will_show(
-                txt, c, "preview" + self._previewState.capitalize()
-            )
-            self._lastPreviewState = self._previewStateAndMod()
-        self._previewWeb.eval("{}({},'{}');".format(
-            func, json.dumps(txt), bodyclass))
+            self._lastPreviewState = currentState
+        self._previewRendering = True
+        sent = time.perf_counter()
+        self._previewWeb.evalWithCallback(
+            "{}({},'{}');".format(func, json.dumps(txt), bodyclass),
+            lambda result: self._onPreviewRendered(func, sent))
         self._previewCardChanged = False
 
+    def _onPreviewRendered(self, func: str, sent: float) -> None:
+        """Called once the webview has run func, sent to it at time
+        sent, showing the card."""
+        global _render_seconds
+        self._previewRendering = False
+        now = time.perf_counter()
+        timings.record(func, now - sent)
+        _render_seconds += 0.25 * (
+            now - self._lastPreviewRender - _render_seconds)
+        if self._clicked is not None:
+            timings.record("click to first paint", now - self._clicked)
+            self._clicked = None
+        if self._previewRenderRequested and self._previewWindow:
+            self._renderPreview()
+
+    def _render_card(self, c: Card, state: str, reload: bool = True) -> Tuple[str, str]:
+        """The javascript function and the html showing side `state` of c.
+
+        reload should only be False if c was rendered since its note
+        was last loaded."""
+        # need to force reload even if answer
+        txt = c.q(reload=reload)
+        func = "_showQuestion"
+        if state == "answer":
+            func = "_showAnswer"
+            txt = c.a()
+        txt = re.sub(r"\[\[type:[^]]+\]\]", "", txt)
+        txt = self.mw.prepare_card_text_for_display(txt)
+        txt = gui_hooks.card_will_show(txt, c, "preview" + state.capitalize())
+        return func, txt
+
+    def _needsReload(self, c: Card) -> bool:
+        """Whether c's note must be reloaded before rendering it."""
+        return True
+
     def _onPreviewShowBothSides(self, toggle):
         self._previewBothSides = toggle
         self.mw.col.set_config("previewBothSides", toggle)
@@ -204,9 +416,7 @@ class Previewer:
 
     def _previewStateAndMod(self):
         c = self.card()
-        n = c.note()
-        n.load()
-        return (self._previewState, c.id, n.mod)
+        return (self._previewState, c.id, note_mod(c.nid))
 
 
 class PreviewerMultipleCards(Previewer):
@@ -308,40 +518,171 @@ class PreviewerBrowser(PreviewerMultipleCards):
         self._updatePreviewButtons()
 
 
+# The list previewers open, and the counts of the card caches of those
+# closed, for the timings dialog.
+_open_list_previewers: Set["PreviewerListCards"] = set()
+_closed_card_counts = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def card_cache_stats() -> Dict[str, int]:
+    """The statistics of the card caches of all the list previewers."""
+    stats = {"size": getUserOption("Previewer card cache size", 20),
+             "entries": 0, **_closed_card_counts}
+    for previewer in _open_list_previewers:
+        for key, value in previewer.cache_stats().items():
+            if key != "size":
+                stats[key] += value
+    return stats
+
+
+timings.add_cache("Previewer cards", card_cache_stats)
+
+
 class PreviewerListCards(PreviewerMultipleCards):
-    def __init__(self, cards: List[Union[Card, int]], *args, **kwargs):
+    def __init__(self, cards: Sequence[Union[Card, int]], *args, **kwargs):
         """A previewer displaying a list of card.
 
         List can be changed by setting self.cards to a new value.
 
-        self.cards contains both cid and card. So that card is loaded
-        only when required and is not loaded twice.
+        self.cards may contain both cid and card, e.g. an array of
+        cids. It is the backing store of self._loaded, a LRU cache of
+        the cards loaded, indexed by their position. A card is loaded
+        only when required, and evicted cards are reloaded from their
+        cid, so that memory stays bounded however long the session is.
 
         """
         self.index = 0
+        self._prefetch_radius = getUserOption("Previewer prefetch radius", 2)
+        # Incremented whenever a prefetch becomes stale.
+        self._prefetch_generation = 0
+        self._loaded = LRUCache(max(
+            getUserOption("Previewer card cache size", 20),
+            2 * self._prefetch_radius + 1))
+        # For the cards whose templates were rendered, the stamp of the
+        # collection then. Their rendering is up to date while the
+        # stamp is unchanged.
+        self._rendered = LRUCache(self._loaded.size)
         self.cards = cards
         super().__init__(*args, **kwargs)
 
+    @property
+    def cards(self) -> Sequence[Union[Card, int]]:
+        return self._cards
+
+    @cards.setter
+    def cards(self, cards: Sequence[Union[Card, int]]) -> None:
+        self._cards = cards
+        self._loaded.clear()
+        self._rendered.clear()
+
     def card(self):
         if not self.cards:
             return None
-        if isinstance(self.cards[self.index], int):
-            self.cards[self.index] = self.mw.col.getCard(
-                self.cards[self.index])
-        return self.cards[self.index]
+        card = self._loaded.get(self.index)
+        if card is None:
+            card = self.cards[self.index]
+            if isinstance(card, int):
+                with timings.span("load card"):
+                    card = self.mw.col.getCard(card)
+            self._loaded.put(self.index, card)
+        return card
+
+    def extend(self, cids: Sequence[int]) -> None:
+        """Add cards at the end of the list, e.g. while the search is
+        still being received."""
+        self.cards.extend(cids)
+        self._updatePreviewButtons()
+
+    def cache_stats(self) -> Dict[str, int]:
+        return self._loaded.stats()
+
+    def _renderScheduledPreview(self) -> None:
+        super()._renderScheduledPreview()
+        self._updatePreviewButtons()
+        self._prefetch()
+
+    def _prefetch(self) -> None:
+        """Load the cards around self.index and render their templates
+        in the background.
+
+        So that going to the next or previous card neither loads the
+        card nor renders its templates on the main thread. Only the
+        card_will_show filters are left, as they may use the GUI. Any
+        previous prefetch is cancelled, as the index it was computed
+        for is stale.
+        """
+        self._prefetch_generation += 1
+        generation = self._prefetch_generation
+        if not self._previewWindow or not self.cards:
+            return
+        to_load = {}
+        for distance in range(1, self._prefetch_radius + 1):
+            for index in (self.index + distance, self.index - distance):
+                if 0 <= index < len(self.cards) and index not in self._loaded:
+                    to_load[index] = self.cards[index]
+        if not to_load:
+            return
+        current = stamp()
+
+        def load() -> Dict[int, Card]:
+            loaded = {}
+            for index, card in to_load.items():
+                if generation != self._prefetch_generation:
+                    break
+                if isinstance(card, int):
+                    card = self.mw.col.getCard(card)
+                # Computes and keeps the card's rendering.
+                card.render_output()
+                loaded[index] = card
+            return loaded
+
+        def on_done(future) -> None:
+            if generation != self._prefetch_generation or not self._previewWindow:
+                return
+            try:
+                loaded = future.result()
+            except Exception:
+                # Prefetching is only an optimization, the card is
+                # loaded again when required.
+                return
+            for index, card in loaded.items():
+                self._loaded.put(index, card)
+                self._rendered.put(card.id, current)
+
+        self.mw.taskman.run_in_background(load, on_done)
+
+    def _needsReload(self, c: Card) -> bool:
+        current = stamp()
+        up_to_date = self._rendered.get(c.id) == current
+        self._rendered.put(c.id, current)
+        return not up_to_date
+
+    def _onClosePreview(self):
+        self._prefetch_generation += 1
+        if self in _open_list_previewers:
+            _open_list_previewers.remove(self)
+            stats = self.cache_stats()
+            for key in _closed_card_counts:
+                _closed_card_counts[key] += stats[key]
+        super()._onClosePreview()
 
     def _openPreview(self):
         if not self.cards:
             return
+        _open_list_previewers.add(self)
         super()._openPreview()
 
     def _onPreviewPrevCard(self):
-        self.index -= 1
-        self._renderPreview()
+        # The arrow keys may be pressed faster than the buttons are
+        # updated.
+        if self.index > 0:
+            self.index -= 1
+            self._renderPreview(True)
 
     def _onPreviewNextCard(self):
-        self.index += 1
-        self._renderPreview()
+        if self.index < len(self.cards) - 1:
+            self.index += 1
+            self._renderPreview(True)
 
     def _should_enable_prev(self):
         return super()._should_enable_prev() or self.index > 0
@@ -0,0 +1,94 @@
+"""Updates the links whose note or card ids changed, e.g. after notes
+were imported, merged, or had their note type changed.
+
+The mapping is read from a text file, one target by line:
+    nid OLD NEW
+    cid OLD NEW
+    nid OLD GUID
+The last form maps the old note id to the note which now has this
+guid. Such a file is written by "Export note guids" in the collection
+where the links were created, so that it can be used after those notes
+are imported in another one.
+"""
+from typing import Dict
+
+from anki.lang import _
+from aqt import mw
+from aqt.qt import QAction
+from aqt.utils import getFile, getSaveFile, showInfo, showWarning
+
+from .guids import nid_of_guid
+from .links import Link, direct_target
+from .rewrite import rewrite_links
+
+Mapping = Dict[str, Dict[int, int]]
+
+
+def read_mapping(path: str) -> Mapping:
+    """For "nid" and "cid", the new id of each old id of the file."""
+    mapping: Mapping = {"nid": {}, "cid": {}}
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            parts = line.split()
+            if len(parts) != 3 or parts[0] not in mapping or not parts[1].isdigit():
+                raise ValueError(
+                    _("Line %d is not \"nid|cid OLD NEW\": %s") % (number, line))
+            kind, old, new = parts
+            old_id = int(old)
+            if new.isdigit():
+                mapping[kind][old_id] = int(new)
+            elif kind == "nid":
+                nid = nid_of_guid(new)
+                if nid is not None:
+                    mapping[kind][old_id] = nid
+    return mapping
+
+
+def remap_link(mapping: Mapping, link: Link) -> Link:
+    target = direct_target(link.query)
+    if target is None:
+        return link
+    kind, ids = target
+    new_ids = [mapping[kind].get(id, id) for id in ids]
+    if new_ids == ids:
+        return link
+    return link._replace(
+        query=f"{kind}:" + ",".join(str(id) for id in new_ids))
+
+
+def remap_links() -> None:
+    path = getFile(mw, _("Link id mapping"), None, filter="*.txt", key="link_remap")
+    if not path:
+        return
+    try:
+        mapping = read_mapping(path)
+    except (OSError, ValueError) as error:
+        showWarning(str(error))
+        return
+    rewritten = rewrite_links(
+        lambda link: remap_link(mapping, link), _("Remap link ids"))
+    showInfo(_("%d notes with links read, %d changed, in %.1f seconds (%d notes per second).") % (
+        rewritten.notes, rewritten.changed, rewritten.seconds,
+        rewritten.notes_per_second()))
+
+
+def export_guids() -> None:
+    path = getSaveFile(mw, _("Export note guids"), "link_remap", _("Text"),
+                       ".txt", "note_guids.txt")
+    if not path:
+        return
+    with open(path, "w", encoding="utf-8") as file:
+        for nid, guid in mw.col.db.execute("select id, guid from notes"):
+            file.write(f"nid {nid} {guid}\n")
+    showInfo(_("Use this file with \"Remap link ids\" in the collection where those notes are imported."))
+
+
+action = QAction(_("Remap link ids..."), mw)
+action.triggered.connect(remap_links)
+mw.form.menuTools.addAction(action)
+
+action = QAction(_("Export note guids..."), mw)
+action.triggered.connect(export_guids)
+mw.form.menuTools.addAction(action)
@@ -0,0 +1,62 @@
+"""Rewrites the links of the whole collection in one undoable step."""
+import time
+from typing import Callable, NamedTuple
+
+from anki.lang import _
+from aqt import mw
+
+from .links import SQL_FILTER, Link, replace_links
+
+# Number of notes read from the collection at once.
+CHUNK_SIZE = 1000
+
+
+class Rewritten(NamedTuple):
+    # Number of notes which may contain a link.
+    notes: int
+    # Number of notes modified.
+    changed: int
+    seconds: float
+
+    def notes_per_second(self) -> float:
+        return self.notes / self.seconds if self.seconds else 0
+
+
+def rewrite_links(replace: Callable[[Link], Link], label: str) -> Rewritten:
+    """Replace each link of the collection by replace(link)."""
+    return rewrite_fields(lambda html: replace_links(html, replace), label)
+
+
+def rewrite_fields(transform: Callable[[str], str], label: str) -> Rewritten:
+    """Replace each field which may contain a link by transform(field).
+
+    The notes are read by chunks, so that memory use does not depend
+    on the size of the collection. Only the notes whose fields change
+    are loaded and saved. A checkpoint named label allows to undo the
+    whole rewriting at once."""
+    start = time.time()
+    mw.checkpoint(label)
+    mw.progress.start(label=label, immediate=True)
+    notes = changed = 0
+    last_nid = 0
+    try:
+        while True:
+            rows = mw.col.db.all(
+                f"select id, flds from notes where id > ? and {SQL_FILTER} order by id limit {CHUNK_SIZE}",
+                last_nid)
+            if not rows:
+                break
+            last_nid = rows[-1][0]
+            notes += len(rows)
+            for nid, flds in rows:
+                if transform(flds) == flds:
+                    continue
+                note = mw.col.getNote(nid)
+                note.fields = [transform(field) for field in note.fields]
+                note.flush()
+                changed += 1
+            mw.progress.update(label=_("%s: %d notes") % (label, notes))
+    finally:
+        mw.progress.finish()
+    mw.reset()
+    return Rewritten(notes, changed, time.time() - start)
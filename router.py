@@ -0,0 +1,60 @@
+"""Dispatches the bridge commands of this add-on.
+
+A single handler is added to webview_did_receive_js_message. A command
+is "Name:argument", and the handler registered for Name is called with
+argument and the webview's context. Finding it is a dictionary lookup,
+whatever the number of registered commands, so that the messages of
+Anki itself, such as "play:" or "key:", cost almost nothing.
+"""
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Tuple
+
+from aqt import gui_hooks
+
+from . import timings
+
+Handler = Callable[[str, Any], Any]
+
+
+@dataclass
+class CommandStats:
+    calls: int = 0
+    errors: int = 0
+    seconds: float = 0
+    max_seconds: float = 0
+
+
+_handlers: Dict[str, Handler] = {}
+stats: Dict[str, CommandStats] = {}
+
+
+def register(name: str, handler: Handler) -> None:
+    """Call handler(argument, context) on each message "name:argument".
+
+    The value returned by handler is sent back to the webview."""
+    _handlers[name] = handler
+    stats[name] = CommandStats()
+
+
+def on_js_message(handled: Tuple[bool, Any], cmd: str, context: Any) -> Tuple[bool, Any]:
+    name, colon, argument = cmd.partition(":")
+    handler = _handlers.get(name) if colon else None
+    if handler is None:
+        return handled
+    command_stats = stats[name]
+    command_stats.calls += 1
+    start = time.perf_counter()
+    try:
+        with timings.span("bridge " + name, argument):
+            return (True, handler(argument, context))
+    except Exception:
+        command_stats.errors += 1
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        command_stats.seconds += elapsed
+        command_stats.max_seconds = max(command_stats.max_seconds, elapsed)
+
+
+gui_hooks.webview_did_receive_js_message.append(on_js_message)
@@ -0,0 +1,184 @@
+from typing import Callable, List, Optional, Sequence
+
+from anki.lang import _
+from anki.utils import ids2str
+from aqt import mw
+from aqt.utils import tooltip
+
+from . import timings
+from .cache import LRUCache
+from .changes import stamp
+from .config import getUserOption
+from .guids import nid_of_guid
+from .links import direct_target, guid_target
+
+# Number of cids given at once to the page callback.
+PAGE_SIZE = 1000
+
+OnPage = Callable[[Sequence[int], bool], None]
+
+# For each normalized search, the stamp of the collection when it was
+# run and its cids.
+_results = LRUCache(getUserOption("Link search cache size", 100))
+timings.add_cache("Link searches", _results.stats)
+
+
+def normalize(search: str) -> str:
+    search = search.strip()
+    if '"' not in search:
+        # Spaces are meaningful inside quotes only.
+        search = " ".join(search.split())
+    return search
+
+
+def direct_cids(search: str) -> Optional[List[int]]:
+    """The cids of a nid:, cid: or guid: search, found without the
+    search engine. None for any other search."""
+    guid = guid_target(search)
+    if guid is not None:
+        target = ("nid", [nid_of_guid(guid) or 0])
+    else:
+        target = direct_target(search)
+    if target is None:
+        return None
+    kind, ids = target
+    if kind == "nid":
+        return mw.col.db.list(
+            f"select id from cards where nid in {ids2str(ids)} order by nid, ord")
+    existing = set(mw.col.db.list(
+        f"select id from cards where id in {ids2str(ids)}"))
+    return [cid for cid in ids if cid in existing]
+
+
+def cached_cids(search: str) -> Optional[Sequence[int]]:
+    """The cids of the normalized search if they can be found quickly,
+    None otherwise."""
+    cids = direct_cids(search)
+    if cids is not None:
+        return cids
+    entry = _results.get(search)
+    if entry is not None and entry[0] == stamp():
+        return entry[1]
+    return None
+
+
+def _search(search: str) -> List[int]:
+    """mw.col.find_cards, timed."""
+    with timings.span("find_cards", search):
+        return mw.col.find_cards(search)
+
+
+def find_cards_in_background(
+        search: str, on_done: Callable[[Optional[Sequence[int]]], None]) -> None:
+    """Call on_done with the cids of search, on the main thread.
+
+    The search runs in the background unless its result is cached. An
+    invalid search gives None."""
+    search = normalize(search)
+    cids = cached_cids(search)
+    if cids is not None:
+        on_done(cids)
+        return
+    current = stamp()
+
+    def on_found(future) -> None:
+        try:
+            cids = future.result()
+        except Exception:
+            on_done(None)
+            return
+        _results.put(search, (current, cids))
+        on_done(cids)
+
+    mw.taskman.run_in_background(lambda: _search(search), on_found)
+
+
+class Resolution:
+    """The cids of a search, found in the background.
+
+    on_page(cids, last) is called on the main thread with successive
+    pages of the result, last being True for the last one, possibly
+    empty. It is never called once the resolution is cancelled, either
+    by the user from the progress window, or by a newer resolution.
+    """
+
+    def __init__(self, search: str, on_page: OnPage):
+        self.search = normalize(search)
+        self.on_page = on_page
+        self.cancelled = False
+        self._finished = False
+        self._poll_timer = None
+
+    def start(self) -> None:
+        cids = cached_cids(self.search)
+        if cids is not None:
+            self._finished = True
+            self._send_pages(cids, 0)
+            return
+        self._stamp = stamp()
+        mw.progress.start(label=_("Searching link target..."), immediate=False)
+        self._poll_timer = mw.progress.timer(100, self._poll_cancel, True)
+        mw.taskman.run_in_background(self._find, self._on_found)
+
+    def cancel(self) -> None:
+        self.cancelled = True
+        self._finish()
+
+    def _find(self) -> List[int]:
+        return _search(self.search)
+
+    def _on_found(self, future) -> None:
+        if self.cancelled:
+            return
+        self._finish()
+        try:
+            cids = future.result()
+        except Exception:
+            tooltip(_("Invalid search: %s") % self.search)
+            return
+        _results.put(self.search, (self._stamp, cids))
+        self._send_pages(cids, 0)
+
+    def _send_pages(self, cids: Sequence[int], start: int) -> None:
+        """Send the page starting at `start`, and schedule the next one,
+        so that the main thread is never busy for long."""
+        if self.cancelled:
+            return
+        end = start + PAGE_SIZE
+        last = end >= len(cids)
+        self.on_page(cids[start:end], last)
+        if not last:
+            mw.progress.timer(0, lambda: self._send_pages(cids, end), False)
+
+    def _poll_cancel(self) -> None:
+        if mw.progress.want_cancel():
+            self.cancel()
+
+    def searching(self) -> bool:
+        return not self._finished
+
+    def _finish(self) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        self._poll_timer.stop()
+        mw.progress.finish()
+
+
+_current: Optional[Resolution] = None
+
+
+def resolve(search: str, on_page: OnPage) -> Resolution:
+    """Find the cids of `search` without blocking the main thread.
+
+    See Resolution for on_page. The pending resolution, if any, is
+    cancelled, as the user asked for another link. A resolution whose
+    search is over is not: the pages it still sends complete its
+    previewer.
+    """
+    global _current
+    if _current is not None and _current.searching():
+        _current.cancel()
+    _current = Resolution(search, on_page)
+    _current.start()
+    return _current
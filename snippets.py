@@ -0,0 +1,102 @@
+"""Short descriptions of link targets, shown when hovering a link.
+
+web/snippets.js asks for the snippets of all links of a page at once,
+when they appear, and sets them as the links' titles. Hovering a link
+then only shows its title.
+
+Only nid:, cid: and guid: targets, and searches whose result is already
+cached, are resolved: they cost one batched, indexed query. Other
+searches are described by their query, to never run a search while the
+card is shown.
+"""
+import json
+from typing import Dict, List, Optional, Tuple
+
+from anki.lang import _
+from anki.utils import ids2str
+from aqt import mw
+
+from . import router, timings
+from .cache import LRUCache
+from .changes import stamp
+from .config import getUserOption
+from .guids import nid_of_guid
+from .links import direct_target, guid_target
+from .search import cached_cids, normalize
+
+# Maximal length of a snippet.
+MAX_LENGTH = 120
+# Number of sort fields in the snippet of a link to many notes.
+SORT_FIELDS_SHOWN = 3
+
+# For each query, the stamp of the collection and its snippet.
+_snippets = LRUCache(getUserOption("Link snippet cache size", 500))
+timings.add_cache("Link snippets", _snippets.stats)
+
+
+def _describe(sort_fields: List[str], notes: int) -> str:
+    if not notes:
+        return _("No note found")
+    text = ", ".join(sort_fields[:SORT_FIELDS_SHOWN])
+    if notes > SORT_FIELDS_SHOWN:
+        text += _(" (%d notes)") % notes
+    if len(text) > MAX_LENGTH:
+        text = text[:MAX_LENGTH - 1] + "…"
+    return text
+
+
+def _target(query: str) -> Optional[Tuple[str, List[int]]]:
+    """("nid", nids) or ("cid", cids) targeted by query, or None if
+    finding them would require to run a search."""
+    guid = guid_target(query)
+    if guid is not None:
+        return ("nid", [nid_of_guid(guid) or 0])
+    target = direct_target(query)
+    if target is not None:
+        return target
+    cids = cached_cids(normalize(query))
+    return None if cids is None else ("cid", list(cids))
+
+
+def snippets(queries: List[str]) -> Dict[str, str]:
+    """The snippet of each query. The targets of all queries are read
+    with one query on the cards table and one on the notes table."""
+    current = stamp()
+    result = {}
+    targets = {}
+    for query in set(queries):
+        entry = _snippets.get(query)
+        if entry is not None and entry[0] == current:
+            result[query] = entry[1]
+            continue
+        target = _target(query)
+        if target is None:
+            result[query] = _("Search: %s") % query
+        else:
+            targets[query] = target
+    all_cids = {cid for kind, ids in targets.values() if kind == "cid" for cid in ids}
+    nid_of_cid = dict(mw.col.db.all(
+        f"select id, nid from cards where id in {ids2str(all_cids)}"))
+    nids_of_query = {}
+    for query, (kind, ids) in targets.items():
+        if kind == "cid":
+            ids = [nid_of_cid[cid] for cid in ids if cid in nid_of_cid]
+        nids_of_query[query] = list(dict.fromkeys(ids))
+    all_nids = {nid for nids in nids_of_query.values() for nid in nids}
+    sort_field_of_nid = dict(mw.col.db.all(
+        f"select id, sfld from notes where id in {ids2str(all_nids)}"))
+    for query, nids in nids_of_query.items():
+        existing = [nid for nid in nids if nid in sort_field_of_nid]
+        snippet = _describe(
+            [str(sort_field_of_nid[nid]) for nid in existing[:SORT_FIELDS_SHOWN]],
+            len(existing))
+        _snippets.put(query, (current, snippet))
+        result[query] = snippet
+    return result
+
+
+def on_bridge_snippets(argument, context):
+    return snippets(json.loads(argument))
+
+
+router.register("Link snippets", on_bridge_snippets)
@@ -0,0 +1,10 @@
+"""The add-on is loaded as package link_addon, with the stand-ins of
+bench/fake_anki.py for Anki, on a small synthetic collection."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+
+import fake_anki  # noqa: E402
+
+fake_anki.load_addon(fake_anki.make_collection(100, 0.1))
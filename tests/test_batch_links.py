@@ -0,0 +1,29 @@
+import types
+
+import fake_anki
+from aqt import mw
+
+from link_addon import batch_links
+from link_addon.links import find_links
+
+
+def test_links_are_inserted_after_the_editor_saved():
+    target = mw.col.getNote(1_000_030)
+    saved = []
+
+    def save_now(callback):
+        # The editor's pending change to the target note.
+        target.fields[0] = "edited"
+        target.flush()
+        saved.append(True)
+        callback()
+
+    browser = fake_anki.Browser()
+    browser.selectedCards = lambda: [2_000_040, 2_000_042]
+    browser.editor = types.SimpleNamespace(note=target, saveNow=save_now)
+    batch_links.link_selection(browser)
+    fake_anki.loop.run()
+    assert saved == [True]
+    front = mw.col.getNote(target.id).fields[0]
+    assert front.startswith("edited<ul>")
+    assert [link.query for link in find_links(front)] == ["nid:1000020", "nid:1000021"]
@@ -0,0 +1,17 @@
+import fake_anki
+from aqt import mw
+
+from link_addon import config, editor
+
+
+def test_link_dialog_writes_configuration_once():
+    config.flush()
+    count = config.write_count
+    writes = mw.addonManager.writes
+    # Choices differing from the last ones, each saved as an option.
+    config.setUserOption("Last open in", "Previewer")
+    config.setUserOption("Last search type", "Card")
+    editor.create_link(fake_anki.Editor(mw.col.getNote(1_000_001)))
+    fake_anki.loop.run()
+    assert config.write_count - count == 1
+    assert mw.addonManager.writes - writes == 1
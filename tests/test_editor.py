@@ -0,0 +1,28 @@
+import types
+
+import fake_anki
+from aqt import mw
+
+from link_addon import editor
+
+
+class Label(fake_anki.QWidget):
+    shown = []
+
+    def setText(self, text):
+        self.shown.append(text)
+
+
+def test_match_count_shows_first_matches_in_order(monkeypatch):
+    monkeypatch.setattr(editor, "QLabel", Label)
+    # Not in the order of the cards table.
+    cids = [2_000_050, 2_000_010, 2_000_030, 2_000_020]
+    monkeypatch.setattr(mw.col, "find_cards", lambda query: cids)
+    form = types.SimpleNamespace(
+        line_search=fake_anki.QLineEdit(), combo_search_type=fake_anki.QComboBox(),
+        formLayout=fake_anki.QWidget())
+    stop = editor.add_match_count(form, None, lambda: "deck:Big")
+    fake_anki.loop.run()
+    stop()
+    names = [mw.col.getNote(cid // 2).fields[0] for cid in cids[:editor.MATCHES_SHOWN]]
+    assert Label.shown[-1] == "4 cards: " + ", ".join(names)
@@ -0,0 +1,93 @@
+import pytest
+
+from link_addon.links import (Link, direct_target, find_links, guid_target,
+                              link_html, replace_links, to_data_attributes)
+
+QUERIES = [
+    "nid:123",
+    'deck:"My deck" tag:a',
+    "tag:a&b",
+    "prop:ivl>10 -is:new",
+    "it's",
+    r"back\slash \1",
+    "&amp; already escaped",
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_data_link_round_trip(query):
+    text = link_html("Previewer", query, "text")
+    assert list(find_links(text)) == [Link("Previewer", query)]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_replace_keeps_unchanged_links(query):
+    text = "before " + link_html("Browser search", query, "text") + " after"
+    assert replace_links(text, lambda link: link) == text
+
+
+def test_attributes_in_any_order_and_among_others():
+    text = ('<a class="x" data-link-query="tag:a&amp;b" title="a > b" '
+            'data-link-open="Browser search">text</a>')
+    assert list(find_links(text)) == [Link("Browser search", "tag:a&b")]
+    replaced = replace_links(
+        text, lambda link: link._replace(open_in="Previewer", query="nid:1"))
+    assert replaced == ('<a class="x" data-link-query="nid:1" title="a > b" '
+                        'data-link-open="Previewer">text</a>')
+
+
+def test_unescaped_greater_than_in_attribute():
+    # The editor does not escape ">" in attribute values.
+    text = '<a data-link-open="Previewer" data-link-query="prop:ivl>10">text</a>'
+    assert list(find_links(text)) == [Link("Previewer", "prop:ivl>10")]
+
+
+def test_links_with_one_attribute_are_ignored():
+    text = '<a data-link-query="nid:1">text</a> <a href="x">y</a>'
+    assert list(find_links(text)) == []
+    assert replace_links(text, lambda link: Link("Previewer", "nid:2")) == text
+
+
+def test_replacement_with_backslashes():
+    text = link_html("Previewer", "nid:1", "text")
+    replaced = replace_links(text, lambda link: link._replace(query=r"a\1\\b"))
+    assert list(find_links(replaced)) == [Link("Previewer", r"a\1\\b")]
+
+
+ONCLICK = """<a href="#" onclick="pycmd('Previewer:deck:&quot;My deck&quot; tag:a&amp;b')">text</a>"""
+
+
+def test_onclick_link_is_found():
+    assert list(find_links(ONCLICK)) == [Link("Previewer", 'deck:"My deck" tag:a&b')]
+
+
+def test_onclick_replace_round_trip():
+    assert replace_links(ONCLICK, lambda link: link) == ONCLICK
+    replaced = replace_links(ONCLICK, lambda link: link._replace(query='tag:"x"&y'))
+    assert list(find_links(replaced)) == [Link("Previewer", 'tag:"x"&y')]
+
+
+def test_to_data_attributes():
+    converted = to_data_attributes(ONCLICK)
+    assert "onclick" not in converted
+    assert list(find_links(converted)) == list(find_links(ONCLICK))
+    # Converting again changes nothing.
+    assert to_data_attributes(converted) == converted
+
+
+def test_both_formats_in_one_field():
+    text = ONCLICK + link_html("Browser search", "nid:1", "other")
+    assert list(find_links(text)) == [
+        Link("Browser search", "nid:1"),
+        Link("Previewer", 'deck:"My deck" tag:a&b'),
+    ]
+    converted = to_data_attributes(text)
+    assert sorted(find_links(converted)) == sorted(find_links(text))
+
+
+def test_direct_and_guid_targets():
+    assert direct_target("nid:1,2") == ("nid", [1, 2])
+    assert direct_target("cid:3") == ("cid", [3])
+    assert direct_target("nid:1 tag:a") is None
+    assert guid_target("guid:abc") == "abc"
+    assert guid_target("nid:1") is None
@@ -0,0 +1,37 @@
+import fake_anki
+from aqt import mw
+
+from link_addon import note_index
+
+
+def test_index_is_built_once_in_background():
+    note_index._on_profile_closed()
+    built = []
+    note_index.build_in_background(lambda: built.append(True))
+    # Typing while the index is built finds nothing, and does not build
+    # it again.
+    calls = mw.col.db.calls
+    assert note_index.find_notes("alpha") == []
+    assert mw.col.db.calls == calls
+    fake_anki.loop.run()
+    assert built == [True]
+    assert note_index.find_notes(" 7")[0] == (1_000_007, mw.col.getNote(1_000_007).fields[0])
+
+
+def test_notes_changed_while_building_are_found():
+    note_index._on_profile_closed()
+    note_index.build_in_background()
+    note = mw.col.getNote(1_000_008)
+    note.fields[0] = "renamed while building"
+    note.flush()
+    fake_anki.loop.run()
+    assert note_index.find_notes("while building") == [(1_000_008, "renamed while building")]
+
+
+def test_stop_waiting():
+    note_index._on_profile_closed()
+    built = []
+    note_index.build_in_background(built.append)
+    note_index.stop_waiting(built.append)
+    fake_anki.loop.run()
+    assert built == []
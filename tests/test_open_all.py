@@ -0,0 +1,29 @@
+import fake_anki
+from aqt import mw
+
+from link_addon import open_all
+from link_addon.links import link_html
+from link_addon.previewer_lib import PreviewerListCards
+
+
+def test_invalid_search_only_drops_its_targets(monkeypatch):
+    find_cards = mw.col.find_cards
+
+    def find_valid_cards(query):
+        if "(bad" in query:
+            raise Exception("invalid search")
+        return find_cards(query)
+
+    monkeypatch.setattr(mw.col, "find_cards", find_valid_cards)
+    opened = []
+    monkeypatch.setattr(PreviewerListCards, "_openPreview",
+                        lambda previewer: opened.append(list(previewer.cards)))
+    card = mw.col.getCard(2_000_020)
+    card.note().fields = [
+        link_html("Previewer", "nid:1000001", "a")
+        + link_html("Previewer", "tag:tag4", "b")
+        + link_html("Previewer", "(bad", "c"),
+        ""]
+    open_all.open_all_links(card)
+    fake_anki.loop.run()
+    assert opened == [[2_000_002, 2_000_003] + find_cards("tag:tag4")]
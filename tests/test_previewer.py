@@ -0,0 +1,55 @@
+import fake_anki
+from anki import hooks
+from aqt import mw
+
+from link_addon.previewer_lib import PreviewerSingleCard
+
+
+def preview(cid):
+    """The number of templates rendered to preview card cid."""
+    renders = mw.col.renders
+    previewer = PreviewerSingleCard(mw.col.getCard(cid), None, mw)
+    previewer._openPreview()
+    fake_anki.loop.run()
+    previewer._closePreview()
+    fake_anki.loop.run()
+    return mw.col.renders - renders
+
+
+def test_rendering_is_reused():
+    preview(2_000_000)
+    assert preview(2_000_000) == 0
+
+
+def test_rendering_is_dropped_when_a_card_changes():
+    # E.g. a card moved to another deck, which {{Deck}} shows. The
+    # note mod is unchanged.
+    card = mw.col.getCard(2_000_002)
+    preview(card.id)
+    hooks.card_will_flush(card)
+    assert preview(card.id) == 1
+
+
+def test_link_in_open_previewer_opens_in_spare_window(monkeypatch):
+    created = []
+    init = fake_anki.AnkiWebView.__init__
+
+    def counting_init(web, *args, **kwargs):
+        created.append(web)
+        init(web, *args, **kwargs)
+
+    monkeypatch.setattr(fake_anki.AnkiWebView, "__init__", counting_init)
+    for _ in range(3):
+        outer = PreviewerSingleCard(mw.col.getCard(2_000_010), None, mw)
+        outer._openPreview()
+        fake_anki.loop.run()
+        # A link clicked in the previewer.
+        inner = PreviewerSingleCard(mw.col.getCard(2_000_012), None, mw)
+        inner._openPreview()
+        fake_anki.loop.run()
+        inner._closePreview()
+        outer._closePreview()
+        fake_anki.loop.run()
+    # At most the two windows of the first time, if the pool was empty.
+    assert len(created) <= 2
+    assert outer._previewWeb is not inner._previewWeb
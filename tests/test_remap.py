@@ -0,0 +1,36 @@
+import pytest
+
+from link_addon.links import Link
+from link_addon.remap import read_mapping, remap_link
+
+
+def write(tmp_path, text):
+    path = tmp_path / "mapping.txt"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_read_mapping(tmp_path):
+    # Note 1000003 of the test collection has guid g3.
+    path = write(tmp_path, "nid 1 2\n\ncid 10 20\nnid 5 g3\nnid 6 unknown-guid\n")
+    assert read_mapping(path) == {"nid": {1: 2, 5: 1000003}, "cid": {10: 20}}
+
+
+@pytest.mark.parametrize("line", ["nid 1", "did 1 2", "nid x 2", "nid 1 2 3"])
+def test_read_mapping_rejects_invalid_lines(tmp_path, line):
+    with pytest.raises(ValueError, match="Line 2"):
+        read_mapping(write(tmp_path, f"nid 1 2\n{line}\n"))
+
+
+MAPPING = {"nid": {1: 2, 3: 4}, "cid": {10: 20}}
+
+
+def test_remap_link():
+    assert remap_link(MAPPING, Link("Previewer", "nid:1,3,5")) == Link("Previewer", "nid:2,4,5")
+    assert remap_link(MAPPING, Link("Browser search", "cid:10")) == Link("Browser search", "cid:20")
+
+
+def test_remap_link_keeps_other_links():
+    for link in (Link("Previewer", "nid:5"), Link("Previewer", "cid:1"),
+                 Link("Previewer", "tag:nid:1"), Link("Previewer", "guid:g1")):
+        assert remap_link(MAPPING, link) is link
@@ -0,0 +1,29 @@
+import fake_anki
+from aqt import mw
+
+from link_addon.search import find_cards_in_background
+
+
+def find(search):
+    """The cids of search, and the number of queries run for it."""
+    found = []
+    calls = mw.col.db.calls
+    find_cards_in_background(search, found.append)
+    fake_anki.loop.run()
+    return found[0], mw.col.db.calls - calls
+
+
+def test_search_is_cached():
+    cids, _ = find("tag:tag1")
+    assert find("tag:tag1") == (cids, 0)
+
+
+def test_bulk_change_drops_cached_search():
+    cids, _ = find("tag:tag2")
+    # As the browser adds a tag: no note is flushed, the collection is
+    # not saved, then the main window is reset.
+    mw.col.db.execute("update notes set tags = ' tag2 ' where id = 1000003")
+    mw.reset()
+    new_cids, calls = find("tag:tag2")
+    assert calls == 1
+    assert set(new_cids) == set(cids) | {2_000_006, 2_000_007}
@@ -0,0 +1,24 @@
+import fake_anki
+from aqt import mw
+
+from link_addon import timings
+from link_addon.previewer_lib import PreviewerListCards
+
+
+def test_card_cache_stats_are_shown():
+    before = timings.cache_stats()["Previewer cards"]
+    previewer = PreviewerListCards([2_000_000 + 2 * index for index in range(10)], None, mw)
+    previewer._openPreview()
+    fake_anki.loop.run()
+    for _ in range(6):
+        previewer._onPreviewNext()
+        fake_anki.loop.run()
+    during = timings.cache_stats()["Previewer cards"]
+    assert during["entries"] > 0
+    previewer._closePreview()
+    fake_anki.loop.run()
+    after = timings.as_json()["caches"]["Previewer cards"]
+    assert after["entries"] == 0
+    for key in ("hits", "misses"):
+        assert after[key] == during[key] > before[key]
+    assert "Previewer cards" in timings._stats_html()
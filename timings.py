@@ -0,0 +1,211 @@
+"""Timings of the stages between a click on a link and the display of
+its target, to find out why links are slow.
+
+Recording is off by default, and can be switched on from Tools > Link
+timings. Each stage then records a span: its name, a detail such as
+the search, and its duration. Only the last spans are kept. When
+recording is off, a stage only costs a test of a global variable.
+
+The dialog also shows the hits, misses and evictions of the caches
+registered with add_cache, so that their sizes can be chosen knowingly.
+"""
+import html
+import json
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional
+
+from anki.lang import _
+from aqt import mw
+from aqt.qt import QAction, QCheckBox, QDialog, QDialogButtonBox, QTextBrowser, QVBoxLayout
+from aqt.utils import getSaveFile, tooltip
+
+from .config import getUserOption, setUserOption
+
+# Number of slowest searches shown by the dialog.
+SLOWEST_SHOWN = 10
+
+
+class Span(NamedTuple):
+    name: str
+    detail: str
+    # time.time() when the stage started.
+    start: float
+    seconds: float
+
+
+enabled: bool = getUserOption("Record link timings", False)
+spans: Deque[Span] = deque(maxlen=getUserOption("Link timings kept", 2000))
+# For each cache, by name, a function returning its LRUCache.stats().
+_caches: Dict[str, Callable[[], Dict[str, int]]] = {}
+
+
+class _Span:
+    def __init__(self, name: str, detail: str):
+        self.name = name
+        self.detail = detail
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        record(self.name, time.perf_counter() - self._start, self.detail)
+
+
+class _Nothing:
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+_nothing = _Nothing()
+
+
+def span(name: str, detail: str = ""):
+    """A context manager recording the time spent in it as stage name."""
+    return _Span(name, detail) if enabled else _nothing
+
+
+def record(name: str, seconds: float, detail: str = "") -> None:
+    """Record a stage which took `seconds` and just ended.
+
+    May be called from a background thread."""
+    if enabled:
+        spans.append(Span(name, detail, time.time() - seconds, seconds))
+
+
+def set_enabled(on: bool) -> None:
+    global enabled
+    enabled = on
+    setUserOption("Record link timings", on)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def stage_stats() -> Dict[str, Dict[str, float]]:
+    """For each stage, its number of spans, and their p50, p95 and max
+    in milliseconds."""
+    by_name: Dict[str, List[float]] = {}
+    for recorded in list(spans):
+        by_name.setdefault(recorded.name, []).append(recorded.seconds * 1000)
+    stats = {}
+    for name, milliseconds in sorted(by_name.items()):
+        milliseconds.sort()
+        stats[name] = {
+            "count": len(milliseconds),
+            "p50": _percentile(milliseconds, 0.5),
+            "p95": _percentile(milliseconds, 0.95),
+            "max": milliseconds[-1],
+        }
+    return stats
+
+
+def slowest(name: str, count: int = SLOWEST_SHOWN) -> List[Span]:
+    return sorted((recorded for recorded in list(spans) if recorded.name == name),
+                  key=lambda recorded: recorded.seconds, reverse=True)[:count]
+
+
+def add_cache(name: str, stats: Callable[[], Dict[str, int]]) -> None:
+    """Show the statistics returned by stats() as those of cache name."""
+    _caches[name] = stats
+
+
+def cache_stats() -> Dict[str, Dict[str, int]]:
+    return {name: stats() for name, stats in _caches.items()}
+
+
+def load_milliseconds() -> float:
+    """The time spent loading the add-on when Anki started."""
+    from . import load_seconds
+    return load_seconds * 1000
+
+
+def as_json() -> Dict[str, Any]:
+    return {
+        "load_ms": load_milliseconds(),
+        "stages": stage_stats(),
+        "caches": cache_stats(),
+        "spans": [recorded._asdict() for recorded in list(spans)],
+    }
+
+
+def _caches_html() -> str:
+    rows = "".join(
+        f"<tr><td>{name}</td><td align=right>{stats['entries']} / {stats['size']}</td>"
+        f"<td align=right>{stats['hits']}</td><td align=right>{stats['misses']}</td>"
+        f"<td align=right>{stats['evictions']}</td></tr>"
+        for name, stats in cache_stats().items())
+    return (
+        "<h3>%s</h3><table cellpadding=3><tr><th>%s</th><th>%s</th><th>%s</th>"
+        "<th>%s</th><th>%s</th></tr>%s</table>") % (
+            _("Caches"), _("Cache"), _("Entries / size"), _("Hits"), _("Misses"),
+            _("Evictions"), rows)
+
+
+def _stats_html() -> str:
+    loaded = _("Add-on loaded in %.1f ms.") % load_milliseconds()
+    rows = "".join(
+        f"<tr><td>{name}</td><td align=right>{stats['count']}</td>"
+        f"<td align=right>{stats['p50']:.2f}</td><td align=right>{stats['p95']:.2f}</td>"
+        f"<td align=right>{stats['max']:.2f}</td></tr>"
+        for name, stats in stage_stats().items())
+    if not rows:
+        return "<p>%s</p><p>%s</p>%s" % (loaded, _("No timing recorded."), _caches_html())
+    searches = "".join(
+        f"<tr><td align=right>{recorded.seconds * 1000:.1f}</td><td>{html.escape(recorded.detail)}</td></tr>"
+        for recorded in slowest("find_cards"))
+    return (
+        "<p>%s</p><table cellpadding=3><tr><th>%s</th><th>%s</th><th>p50 ms</th><th>p95 ms</th><th>max ms</th></tr>%s</table>"
+        "<h3>%s</h3><table cellpadding=3>%s</table>%s") % (
+            loaded, _("Stage"), _("Count"), rows, _("Slowest recent searches"), searches,
+            _caches_html())
+
+
+def show_timings() -> None:
+    dialog = QDialog(mw)
+    dialog.setWindowTitle(_("Link timings"))
+    vbox = QVBoxLayout()
+    record_box = QCheckBox(_("Record timings"))
+    record_box.setChecked(enabled)
+    record_box.toggled.connect(set_enabled)
+    vbox.addWidget(record_box)
+    text = QTextBrowser()
+    text.setHtml(_stats_html())
+    vbox.addWidget(text)
+    bbox = QDialogButtonBox(QDialogButtonBox.Close)
+    refresh = bbox.addButton(_("Refresh"), QDialogButtonBox.ActionRole)
+    refresh.clicked.connect(lambda: text.setHtml(_stats_html()))
+    clear = bbox.addButton(_("Clear"), QDialogButtonBox.ActionRole)
+
+    def on_clear() -> None:
+        spans.clear()
+        text.setHtml(_stats_html())
+
+    clear.clicked.connect(on_clear)
+    export = bbox.addButton(_("Export..."), QDialogButtonBox.ActionRole)
+    export.clicked.connect(lambda: export_json(dialog))
+    bbox.rejected.connect(dialog.reject)
+    vbox.addWidget(bbox)
+    dialog.setLayout(vbox)
+    dialog.resize(600, 500)
+    mw.setupDialogGC(dialog)
+    dialog.show()
+
+
+def export_json(parent: Optional[QDialog] = None) -> None:
+    path = getSaveFile(parent or mw, _("Export link timings"), "link_timings",
+                       _("JSON"), ".json", "link_timings.json")
+    if not path:
+        return
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(as_json(), file, indent=1)
+    tooltip(_("Link timings exported."))
+
+
+action = QAction(_("Link timings..."), mw)
+action.triggered.connect(show_timings)
+mw.form.menuTools.addAction(action)
@@ -0,0 +1,29 @@
+/* Opens the links of this add-on. See links.py for their format.
+ *
+ * A single listener handles the clicks of the whole page, including
+ * the links of cards shown later. */
+(function () {
+    if (window.linkToOpenBrowserLoaded) {
+        return;
+    }
+    window.linkToOpenBrowserLoaded = true;
+
+    function linkOf(event) {
+        const path = event.composedPath ? event.composedPath() : [event.target];
+        for (const element of path) {
+            if (element.dataset && element.dataset.linkQuery !== undefined) {
+                return element;
+            }
+        }
+        return null;
+    }
+
+    document.addEventListener("click", function (event) {
+        const link = linkOf(event);
+        if (link === null) {
+            return;
+        }
+        event.preventDefault();
+        pycmd(link.dataset.linkOpen + ":" + link.dataset.linkQuery);
+    });
+})();
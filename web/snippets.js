@@ -0,0 +1,37 @@
+/* Sets the title of the links of this add-on to a snippet of their
+ * target, so that hovering a link describes it. See snippets.py.
+ *
+ * The snippets of all links shown are asked for at once, when new
+ * links appear in the page. */
+(function () {
+    if (window.linkSnippetsLoaded) {
+        return;
+    }
+    window.linkSnippetsLoaded = true;
+    let scheduled = false;
+
+    function fetchSnippets() {
+        scheduled = false;
+        const links = Array.from(
+            document.querySelectorAll("[data-link-query]:not([title])"));
+        if (links.length === 0) {
+            return;
+        }
+        const queries = links.map((link) => link.dataset.linkQuery);
+        pycmd("Link snippets:" + JSON.stringify(queries), function (snippets) {
+            for (const link of links) {
+                const snippet = snippets[link.dataset.linkQuery];
+                if (snippet !== undefined) {
+                    link.title = snippet;
+                }
+            }
+        });
+    }
+
+    new MutationObserver(function () {
+        if (!scheduled) {
+            scheduled = true;
+            setTimeout(fetchSnippets, 0);
+        }
+    }).observe(document.documentElement, { childList: true, subtree: true });
+})();